@@ -0,0 +1,49 @@
+"""Requests/sec on an authenticated GET with and without the identity cache.
+
+    python benchmarks/bench_auth.py [--requests 2000]
+
+Runs against a throwaway SQLite database in a temp directory.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="lms_bench_"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+import migrations  # noqa: E402
+
+
+def run(client, headers, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        assert client.get("/api/v1/my-courses", headers=headers).status_code == 200
+    return n / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    migrations.upgrade()
+    client = TestClient(main.app)
+    client.post("/api/v1/users", json={"email": "bench@example.com", "password": "pw", "name": "Bench", "role": "student"})
+    token = client.post("/api/v1/login", data={"username": "bench@example.com", "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    run(client, headers, 100)  # warm up
+
+    ttl = main.auth_cache.ttl
+    main.auth_cache.ttl = 0
+    main.auth_cache.clear()
+    before = run(client, headers, args.requests)
+    main.auth_cache.ttl = ttl
+    after = run(client, headers, args.requests)
+    print(f"GET /api/v1/my-courses x{args.requests}")
+    print(f"  without identity cache: {before:8.1f} req/s")
+    print(f"  with identity cache:    {after:8.1f} req/s  ({after / before:.2f}x)")
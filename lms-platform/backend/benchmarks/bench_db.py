@@ -0,0 +1,101 @@
+"""Concurrent read/write benchmark for the configured database backends.
+
+    python benchmarks/bench_db.py                      # SQLite (WAL) in a temp dir
+    python benchmarks/bench_db.py --url sqlite:///./bench.db --url postgresql://user:pw@localhost/lms_bench
+
+Each URL gets a fresh schema and seed data, then ``--threads`` workers run a
+mix of hot-path reads (enrollment check, module/lesson tree, test results)
+and writes (enrollments, test results) for ``--seconds``. Point the Postgres
+URL at a scratch database: its tables are dropped first.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import func  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import ingest  # noqa: E402
+import migrations  # noqa: E402
+import models  # noqa: E402
+from database import make_engine  # noqa: E402
+
+
+def seed(Session, users, courses):
+    db = Session()
+    db.execute(models.User.__table__.insert(), [{"email": f"u{i}@bench.local", "full_name": f"User {i}", "hashed_password": "x", "role": "student"} for i in range(users)])
+    db.execute(models.Course.__table__.insert(), [{"title": f"Course {i}", "description": "", "price": 0, "is_published": True, "instructor_id": 1} for i in range(courses)])
+    db.execute(models.Module.__table__.insert(), [{"title": f"M{j}", "order": j, "course_id": c + 1} for c in range(courses) for j in range(5)])
+    db.execute(models.ContentItem.__table__.insert(), [{"title": f"L{k}", "type": "video", "order": k, "module_id": m + 1} for m in range(courses * 5) for k in range(4)])
+    db.execute(models.CodeTest.__table__.insert(), [{"title": "T", "pass_key": "k", "time_limit": 60, "instructor_id": 1}])
+    db.commit(); db.close()
+
+
+def worker(Session, users, courses, write_ratio, deadline, latencies, errors):
+    rng = random.Random(threading.get_ident())
+    db = Session()
+    while time.perf_counter() < deadline:
+        uid, cid = rng.randint(1, users), rng.randint(1, courses)
+        start = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                if rng.random() < 0.5:
+                    ingest.insert_results(db.connection(), [{"test_id": 1, "user_id": uid, "score": rng.randint(0, 100), "problems_solved": 1, "time_taken": "1 mins"}])
+                else:
+                    exists = db.query(models.Enrollment.id).filter(models.Enrollment.user_id == uid, models.Enrollment.course_id == cid).first()
+                    if not exists: db.add(models.Enrollment(user_id=uid, course_id=cid))
+                db.commit()
+            else:
+                db.query(models.Enrollment.id).filter(models.Enrollment.user_id == uid, models.Enrollment.course_id == cid).first()
+                mids = [m for (m,) in db.query(models.Module.id).filter(models.Module.course_id == cid).order_by(models.Module.order)]
+                db.query(models.ContentItem.id, models.ContentItem.title).filter(models.ContentItem.module_id.in_(mids)).order_by(models.ContentItem.order).all()
+                db.query(func.count(models.TestResult.id)).filter(models.TestResult.test_id == 1).scalar()
+                db.rollback()
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            db.rollback(); errors.append(type(e).__name__)
+    db.close()
+
+
+def bench(url, threads, seconds, users, courses, write_ratio):
+    engine = make_engine(url)
+    models.Base.metadata.drop_all(bind=engine)
+    migrations.upgrade(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    seed(Session, users, courses)
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    pool = [threading.Thread(target=worker, args=(Session, users, courses, write_ratio, deadline, latencies, errors)) for _ in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    engine.dispose()
+
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    print(f"{url.split('@')[-1]}")
+    print(f"  {len(latencies) / seconds:8.1f} ops/s  p50 {q[49]*1000:6.2f} ms  p95 {q[94]*1000:6.2f} ms  p99 {q[98]*1000:6.2f} ms  errors {len(errors)}"
+          + (f" ({', '.join(sorted(set(errors)))})" if errors else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", action="append", help="database URL (repeatable)")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    urls = args.url or [f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='lms_bench_'), 'bench.db')}"]
+    print(f"{args.threads} threads, {args.seconds:g}s, {args.write_ratio:.0%} writes")
+    for url in urls:
+        bench(url, args.threads, args.seconds, args.users, args.courses, args.write_ratio)
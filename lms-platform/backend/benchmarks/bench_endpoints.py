@@ -0,0 +1,227 @@
+"""Latency and throughput of the hot API endpoints, in-process.
+
+    python benchmarks/bench_endpoints.py                          # all scenarios
+    python benchmarks/bench_endpoints.py --only player,my-courses --concurrency 32
+    python benchmarks/bench_endpoints.py --save-baseline base.json
+    python benchmarks/bench_endpoints.py --compare base.json      # exit 1 on regressions
+
+Seeds a throwaway SQLite database in a temp directory with ``seed_data`` and
+drives the app through httpx's ASGI transport, so no server or network is
+involved. Each scenario runs ``--requests`` calls (scaled down for the
+bcrypt- and file-heavy ones) from ``--concurrency`` concurrent clients.
+
+Before timing, one cold request per hot read endpoint must stay within
+QUERY_BUDGETS, so an N+1 or a lost join fails the run rather than hiding in
+the latency noise.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+INVOKED_FROM = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="lms_bench_"))
+
+import httpx  # noqa: E402
+
+import instrumentation  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+import seed_data  # noqa: E402
+from database import SessionLocal  # noqa: E402
+
+TOKENS = 20  # students that requests are spread over
+
+
+class Fixture:
+    def __init__(self, client, rng):
+        self.client, self.rng = client, rng
+        db = SessionLocal()
+        self.students = [u for (u,) in db.query(models.User.email).filter(models.User.role == "student").order_by(models.User.id).limit(TOKENS)]
+        self.instructor = db.query(models.User.email).filter(models.User.role == "instructor").order_by(models.User.id).first()[0]
+        self.courses = {}
+        for email, cid in db.query(models.User.email, models.Enrollment.course_id).join(models.Enrollment, models.Enrollment.user_id == models.User.id) \
+                .filter(models.User.email.in_(self.students), models.Enrollment.expiry_date.is_(None)):
+            self.courses.setdefault(email, []).append(cid)
+        self.tests = [(tid, key) for tid, key in db.query(models.CodeTest.id, models.CodeTest.pass_key)]
+        self.own_course = db.query(models.Course.id).join(models.User, models.User.id == models.Course.instructor_id) \
+            .filter(models.User.email == self.instructor).first()[0]
+        db.close()
+        self.headers = {}
+        self.admitted = 0
+
+    async def login(self, email):
+        r = await self.client.post("/api/v1/login", data={"username": email, "password": seed_data.SEED_PASSWORD})
+        assert r.status_code == 200, r.text
+        self.headers[email] = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    def student(self):
+        email = self.rng.choice(self.students)
+        return email, self.headers[email]
+
+
+# Each scenario makes one request and returns its status code.
+async def s_login(f):
+    return (await f.client.post("/api/v1/login", data={"username": f.rng.choice(f.students), "password": seed_data.SEED_PASSWORD})).status_code
+
+
+async def s_courses(f):
+    return (await f.client.get("/api/v1/courses", headers=f.student()[1])).status_code
+
+
+async def s_player(f):
+    email, headers = f.student()
+    return (await f.client.get(f"/api/v1/courses/{f.rng.choice(f.courses[email])}/player", headers=headers)).status_code
+
+
+async def s_my_courses(f):
+    return (await f.client.get("/api/v1/my-courses", headers=f.student()[1])).status_code
+
+
+async def s_test_start(f):
+    tid, key = f.rng.choice(f.tests)
+    return (await f.client.post(f"/api/v1/code-tests/{tid}/start", data={"pass_key": key})).status_code
+
+
+async def s_test_submit(f):
+    tid, _ = f.rng.choice(f.tests)
+    body = {"test_id": tid, "score": f.rng.randint(0, 100), "problems_solved": f.rng.randint(0, 4), "time_taken": "30 mins"}
+    status = (await f.client.post("/api/v1/code-tests/submit", json=body, headers=f.student()[1])).status_code
+    return 200 if status == 409 else status  # with TOKENS students most calls are repeats, refused after one indexed lookup
+
+
+async def s_test_results(f):
+    tid, _ = f.rng.choice(f.tests)
+    return (await f.client.get(f"/api/v1/code-tests/{tid}/results", headers=f.headers[f.instructor])).status_code
+
+
+async def s_bulk_admit(f):
+    f.admitted += 1
+    rows = "\n".join(f"Bench {f.admitted}-{i},bench{f.admitted}-{i}@seed.local" for i in range(100))
+    files = {"file": ("students.csv", f"Name,Email\n{rows}\n", "text/csv")}
+    return (await f.client.post("/api/v1/admin/bulk-admit", data={"course_id": str(f.own_course)}, files=files, headers=f.headers[f.instructor])).status_code
+
+
+async def s_pdf(f):
+    email, headers = f.student()
+    return (await f.client.get(f"/api/v1/generate-pdf/{f.rng.choice(f.courses[email])}", headers=headers)).status_code
+
+
+# name -> (scenario, share of --requests)
+SCENARIOS = {
+    "login": (s_login, 0.1),
+    "courses": (s_courses, 1),
+    "player": (s_player, 1),
+    "my-courses": (s_my_courses, 1),
+    "code-test-start": (s_test_start, 1),
+    "code-test-submit": (s_test_submit, 1),
+    "code-test-results": (s_test_results, 0.5),
+    "bulk-admit": (s_bulk_admit, 0.05),
+    "pdf": (s_pdf, 0.5),
+}
+
+
+# Most SQL statements one request may run with the auth and player caches cold;
+# none of these should grow with the size of the course or the catalog.
+QUERY_BUDGETS = {"courses": 2, "player": 5, "my-courses": 2, "code-test-results": 2}
+
+
+async def check_query_budgets(f, names):
+    for name in names:
+        if name not in QUERY_BUDGETS: continue
+        main.auth_cache.clear(); main.player_cache.clear()
+        with instrumentation.assert_max_queries(QUERY_BUDGETS[name]) as stats:
+            status = await SCENARIOS[name][0](f)
+        assert status == 200, f"{name} returned {status}"
+        print(f"  {name:<18} {stats.count} of {QUERY_BUDGETS[name]} queries")
+
+
+async def run_scenario(f, scenario, n, concurrency):
+    latencies, errors, remaining = [], 0, n
+
+    async def client():
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            status = await scenario(f)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400: errors += 1
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [latencies[0]] * 99
+    return {"requests": len(latencies), "errors": errors, "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(q[49] * 1000, 2), "p95_ms": round(q[94] * 1000, 2), "p99_ms": round(q[98] * 1000, 2)}
+
+
+def compare(results, baseline, threshold):
+    """Print the change against a saved run; return the scenarios whose p95 or throughput regressed."""
+    regressed = []
+    print(f"\n  {'vs baseline':<18} {'req/s':>9} {'p95':>9} {'p99':>9}")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base: continue
+        delta = lambda k: (r[k] - base[k]) / base[k] * 100 if base[k] else 0.0
+        worse = delta("p95_ms") > threshold or -delta("rps") > threshold
+        if worse: regressed.append(name)
+        print(f"  {name:<18} {delta('rps'):+8.1f}% {delta('p95_ms'):+8.1f}% {delta('p99_ms'):+8.1f}%{'  ⚠️ regression' if worse else ''}")
+    return regressed
+
+
+async def main_async(args):
+    scale = seed_data.Scale(students=args.students, courses=args.courses)
+    start = time.perf_counter()
+    counts = seed_data.generate(scale, seed=args.seed)
+    print(f"Seeded {counts['users']} users, {counts['courses']} courses, {counts['enrollments']} enrollments, "
+          f"{counts['test_results']} results in {time.perf_counter() - start:.1f}s")
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        f = Fixture(client, random.Random(args.seed))
+        await asyncio.gather(*(f.login(email) for email in [f.instructor, *f.students]))
+        names = args.only.split(",") if args.only else list(SCENARIOS)
+        print("\n  query budget")
+        await check_query_budgets(f, names)
+        results = {}
+        print(f"\n  {'scenario':<18} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for name in names:
+            scenario, share = SCENARIOS[name]
+            n = max(int(args.requests * share), args.concurrency)
+            await run_scenario(f, scenario, min(n, args.concurrency * 2), args.concurrency)  # warm up
+            r = results[name] = await run_scenario(f, scenario, n, args.concurrency)
+            print(f"  {name:<18} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="comma-separated scenarios: " + ",".join(SCENARIOS))
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--threshold", type=float, default=10, help="regression threshold in percent")
+    args = parser.parse_args()
+    for p in ("save_baseline", "compare"):  # relative to where the command was run, not the temp dir
+        if getattr(args, p): setattr(args, p, os.path.join(INVOKED_FROM, getattr(args, p)))
+
+    results = asyncio.run(main_async(args))
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as out:
+            json.dump(results, out, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare) as src:
+            regressed = compare(results, json.load(src), args.threshold)
+        if regressed: sys.exit(1)
@@ -0,0 +1,89 @@
+"""Throughput and tail latency of the Judge0 client against a local fake Judge0.
+
+    python benchmarks/bench_judge0.py [--requests 400] [--concurrency 16] [--latency 0.2]
+
+Compares the old blocking ``requests.post(..., wait=true)`` per call (on a
+thread pool the size of Starlette's default) with the async client, one
+submission per call and as batched test cases. Pass --url to target a real
+Judge0 instead of the fake started here. All submissions arrive at once and
+latency is measured from that burst.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import uvicorn  # noqa: E402
+
+import execution  # noqa: E402
+from fake_judge0 import create_app  # noqa: E402
+
+
+def start_fake(port: int, latency: float):
+    server = uvicorn.Server(uvicorn.Config(create_app(latency), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def report(name, latencies, elapsed):
+    q = statistics.quantiles(latencies, n=100)
+    print(f"  {name:<22} {len(latencies) / elapsed:8.1f} runs/s  p50 {q[49]*1000:7.1f} ms  p95 {q[94]*1000:7.1f} ms  p99 {q[98]*1000:7.1f} ms")
+
+
+def bench_blocking(url, n, threads):
+    import requests
+
+    # All submissions arrive at once, so latency includes time queued for a thread.
+    def call(i):
+        requests.post(f"{url}/submissions?base64_encoded=false&wait=true", json={"source_code": "print(1)", "language_id": 71, "stdin": str(i)}).json()
+        return time.perf_counter() - start
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(call, range(n)))
+    report("blocking wait=true", latencies, time.perf_counter() - start)
+
+
+async def bench_async(url, n, concurrency, batch):
+    backend = execution.Judge0Backend(url=url, api_key="", max_concurrency=concurrency)
+    latencies = []
+
+    async def call(i):
+        jobs = [execution.Job("print(1)", str(i * batch + k)) for k in range(batch)]
+        results = await backend.run_batch(jobs)
+        assert all(r["status"]["id"] == 3 for r in results)
+        latencies.extend([time.perf_counter() - start] * batch)
+    start = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(n // batch)))
+    report(f"async, batch of {batch}", latencies, time.perf_counter() - start)
+    await backend.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url")
+    parser.add_argument("--port", type=int, default=2358)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=execution.JUDGE0_MAX_CONCURRENCY)
+    parser.add_argument("--threads", type=int, default=40, help="threads for the blocking client (Starlette's default pool)")
+    args = parser.parse_args()
+
+    url = args.url or f"http://127.0.0.1:{args.port}"
+    if not args.url:
+        start_fake(args.port, args.latency)
+    print(f"{args.requests} submissions against {url}")
+    try:
+        bench_blocking(url, args.requests, args.threads)
+    except ImportError:
+        print("  (install requests to include the blocking baseline)")
+    asyncio.run(bench_async(url, args.requests, args.concurrency, 1))
+    asyncio.run(bench_async(url, args.requests, args.concurrency, 10))
@@ -0,0 +1,108 @@
+"""Live exam monitoring: how fast a submitted result reaches watching instructors.
+
+    python benchmarks/bench_live.py [--watchers 20] [--slow 2] [--submissions 2000] [--rate 500]
+
+Runs in-process against a throwaway SQLite database. Watchers consume
+``live.stream`` for one test while submissions go through the write-behind
+ingestor at ``--rate`` per second, each carrying its submit time. Reports
+submit-to-delivery latency, checks that every watcher saw every result
+exactly once, and compares the SELECTs issued with what the same watchers
+polling ``/results`` once a second would have cost. ``--slow`` watchers
+read with a delay so their queues overflow and they recover by catching up.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="lms_bench_"))
+
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import ingest  # noqa: E402
+import live  # noqa: E402
+import models  # noqa: E402
+import seed_data  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+
+
+def parse(chunk: bytes):
+    fields = dict(line.split(": ", 1) for line in chunk.decode().splitlines() if ": " in line and not line.startswith(":"))
+    return fields.get("event"), json.loads(fields["data"]) if "data" in fields else None
+
+
+async def watch(test_id: int, expected: int, delay: float):
+    latencies, duplicates, lagged = {}, 0, 0
+    async for chunk in live.stream(test_id):
+        event, data = parse(chunk)
+        if event == "lagged": lagged += 1
+        if event == "result":
+            if data["id"] in latencies: duplicates += 1
+            latencies[data["id"]] = time.perf_counter() - float(data["time_taken"])
+            if len(latencies) == expected: break
+            if delay: await asyncio.sleep(delay)
+    return latencies, duplicates, lagged
+
+
+async def run(args, test_id, student_ids):
+    fast = [asyncio.create_task(watch(test_id, args.submissions, 0)) for _ in range(args.watchers)]
+    slow = [asyncio.create_task(watch(test_id, args.submissions, args.slow_delay)) for _ in range(args.slow)]
+    await asyncio.sleep(0.2)  # let every watcher subscribe
+
+    ingestor = ingest.get_ingestor()
+    start = time.perf_counter()
+    submits = []
+    for i, uid in enumerate(student_ids):
+        await asyncio.sleep(max(start + i / args.rate - time.perf_counter(), 0))
+        submits.append(asyncio.create_task(run_in_threadpool(ingestor.submit, test_id, uid, 100, 1, repr(time.perf_counter()))))
+    await asyncio.gather(*submits)
+    fast_results = await asyncio.wait_for(asyncio.gather(*fast), timeout=60)
+    slow_results = await asyncio.wait_for(asyncio.gather(*slow), timeout=120)
+    return time.perf_counter() - start, fast_results, slow_results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--watchers", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=2)
+    parser.add_argument("--slow-delay", type=float, default=0.005, help="seconds a slow watcher spends per event")
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=500, help="submissions per second")
+    args = parser.parse_args()
+
+    seed_data.generate(seed_data.Scale(instructors=1, students=args.submissions, courses=0, modules_per_course=0, items_per_module=0,
+                                       enrollments_per_student=0, code_tests=1, problems_per_test=1, results_per_test=0))
+    with SessionLocal() as db:
+        test_id = db.query(models.CodeTest.id).scalar()
+        student_ids = [uid for (uid,) in db.query(models.User.id).filter(models.User.role == "student").order_by(models.User.id)]
+    reads = checks = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_reads(conn, cursor, statement, *_):
+        global reads, checks
+        if not statement.lstrip().upper().startswith("SELECT"): return
+        if "FROM test_results JOIN users" in statement: reads += 1  # result rows for watchers
+        elif "FROM test_results" in statement: checks += 1  # the ingestor's repeat-submission lookup
+
+    seconds, fast, slow = asyncio.run(run(args, test_id, student_ids))
+    ingest.shutdown()
+
+    print(f"  {args.submissions} submissions at {args.rate:.0f}/s to {args.watchers} watchers (+{args.slow} slow), {seconds:.1f} s")
+    latencies = sorted(v for lat, _, _ in fast for v in lat.values())
+    q = statistics.quantiles(latencies, n=100)
+    print(f"    submit -> delivered  p50 {q[49] * 1000:7.1f} ms   p95 {q[94] * 1000:7.1f} ms   p99 {q[98] * 1000:7.1f} ms   max {latencies[-1] * 1000:7.1f} ms")
+    for name, results in (("fast", fast), ("slow", slow)):
+        if not results: continue
+        complete = all(len(lat) == args.submissions for lat, _, _ in results)
+        print(f"    {name} watchers: {'every result' if complete else 'MISSING results'}, "
+              f"{sum(d for _, d, _ in results)} duplicates, lagged {sum(g for _, _, g in results)} time(s)")
+    polls = (args.watchers + args.slow) * seconds
+    print(f"    result SELECTs: {reads} (polling /results every 1 s: ~{polls:.0f} requests re-reading up to {args.submissions} rows each)")
+    print(f"    repeat-submission lookups: {checks}")
@@ -0,0 +1,84 @@
+"""Cost of turning large course lists into JSON, old path versus new.
+
+    python benchmarks/bench_serialization.py [--rows 1000 --rows 10000] [--repeat 5]
+
+For each size, loads that many courses from a throwaway SQLite database and
+times query plus encoding:
+
+- ORM + jsonable_encoder: full ORM objects through FastAPI's generic encoder
+  and json.dumps, which is what list endpoints did without a response model
+- columns + response model: column-only rows validated by the Pydantic schema
+  and dumped to JSON by pydantic-core, the response_model path
+- columns + orjson: plain dicts through FastJSONResponse
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="lms_bench_"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+import main  # noqa: E402
+import models  # noqa: E402
+import seed_data  # noqa: E402
+from database import SessionLocal  # noqa: E402
+
+COURSES = TypeAdapter(List[main.CourseOut])
+
+
+def orm_jsonable(db, n):
+    return json.dumps(jsonable_encoder(db.query(models.Course).order_by(models.Course.id).limit(n).all())).encode()
+
+
+def columns_model(db, n):
+    rows = db.query(*main.COURSE_COLUMNS).order_by(models.Course.id).limit(n).all()
+    return COURSES.dump_json(COURSES.validate_python(rows, from_attributes=True))
+
+
+def columns_orjson(db, n):
+    rows = db.query(*main.COURSE_COLUMNS).order_by(models.Course.id).limit(n).all()
+    return main.FastJSONResponse([r._asdict() for r in rows]).body
+
+
+STRATEGIES = {"ORM + jsonable_encoder": orm_jsonable, "columns + response model": columns_model, "columns + orjson": columns_orjson}
+
+
+def timed(fn, db, n, repeat):
+    samples = []
+    for _ in range(repeat):
+        db.expunge_all()  # no identity-map reuse between runs
+        start = time.perf_counter()
+        body = fn(db, n)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), body
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, action="append")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    sizes = args.rows or [1000, 10000]
+
+    seed_data.generate(seed_data.Scale(instructors=5, students=10, courses=max(sizes), modules_per_course=0, items_per_module=0,
+                                       enrollments_per_student=0, code_tests=0, results_per_test=0))
+    db = SessionLocal()
+    print(f"orjson {'installed' if main.orjson else 'not installed, FastJSONResponse falls back to json'}")
+    for n in sizes:
+        print(f"\n  {n} courses")
+        baseline, reference = None, None
+        for name, fn in STRATEGIES.items():
+            seconds, body = timed(fn, db, n, args.repeat)
+            if reference is None: baseline, reference = seconds, json.loads(body)
+            assert json.loads(body) == reference, f"{name} produced different JSON"
+            print(f"    {name:<26} {seconds * 1000:8.2f} ms  {baseline / seconds:5.1f}x")
+    db.close()
@@ -0,0 +1,84 @@
+"""Worker startup cost: import time of main.py and time to first response.
+
+    python benchmarks/bench_startup.py [--runs 5] [--max-import-ms 800] [--max-ttfr-ms 2000]
+
+Each run is a fresh interpreter in a temp directory with an initialised
+SQLite database. Time to first response starts uvicorn and polls ``GET /``
+until it answers. Exits 1 if a median exceeds its --max-* budget, or if a
+module that should load lazily (pandas, reportlab) is imported with main.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ["pandas", "reportlab", "openpyxl", "requests"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+sys.path.insert(0, {BACKEND_DIR!r})
+start = time.perf_counter()
+import main
+print(json.dumps({{"seconds": time.perf_counter() - start, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(workdir):
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", IMPORT_PROBE], cwd=workdir, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_first_response(workdir, timeout=30):
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR, "--port", str(port), "--log-level", "warning"],
+                              cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                time.sleep(0.01)
+        raise RuntimeError("server did not answer")
+    finally:
+        server.terminate(); server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-ttfr-ms", type=float)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lms_bench_")
+    subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "manage.py"), "init"], cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    measure_import(workdir)  # warm the OS file cache and __pycache__
+
+    imports = [measure_import(workdir) for _ in range(args.runs)]
+    import_ms = statistics.median(r["seconds"] for r in imports) * 1000
+    ttfr_ms = statistics.median(measure_first_response(workdir) for _ in range(args.runs)) * 1000
+    loaded = sorted({m for r in imports for m in r["loaded"]})
+
+    print(f"  import main            median {import_ms:7.1f} ms")
+    print(f"  time to first response median {ttfr_ms:7.1f} ms")
+    print(f"  heavy modules loaded   {', '.join(loaded) or 'none'}")
+    failed = bool(loaded)
+    if args.max_import_ms and import_ms > args.max_import_ms: print(f"  ⚠️ import over budget ({args.max_import_ms:.0f} ms)"); failed = True
+    if args.max_ttfr_ms and ttfr_ms > args.max_ttfr_ms: print(f"  ⚠️ first response over budget ({args.max_ttfr_ms:.0f} ms)"); failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,70 @@
+"""Minimal stand-in for the Judge0 submissions API, for offline benchmarks.
+
+    python benchmarks/fake_judge0.py --port 2358 --latency 0.2
+
+Supports POST /submissions (with or without wait=true), POST /submissions/batch,
+GET /submissions/{token} and GET /submissions/batch?tokens=... . Every
+submission "runs" for a random time around --latency and echoes its stdin
+to stdout with status Accepted. Point the API at it with
+EXECUTION_BACKEND=judge0 JUDGE0_URL=http://127.0.0.1:2358 JUDGE0_API_KEY= .
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Query, Request
+
+LATENCY = 0.2
+_submissions = {}
+
+
+def create_app(latency: float = LATENCY, jitter: float = 0.5) -> FastAPI:
+    app = FastAPI(title="fake judge0")
+
+    def submit(payload: dict) -> str:
+        token = str(uuid.uuid4())
+        _submissions[token] = {"ready_at": time.monotonic() + latency * random.uniform(1 - jitter, 1 + jitter), "stdin": payload.get("stdin") or ""}
+        return token
+
+    def result(token: str) -> dict:
+        sub = _submissions.get(token)
+        if sub is None:
+            return None
+        if time.monotonic() < sub["ready_at"]:
+            return {"token": token, "status": {"id": 1, "description": "In Queue"}, "stdout": None, "stderr": None,
+                    "compile_output": None, "message": None, "time": None, "memory": None}
+        return {"token": token, "status": {"id": 3, "description": "Accepted"}, "stdout": sub["stdin"], "stderr": None,
+                "compile_output": None, "message": None, "time": f"{latency:.3f}", "memory": 1024}
+
+    @app.post("/submissions", status_code=201)
+    async def create_submission(request: Request, wait: bool = False):
+        token = submit(await request.json())
+        if not wait:
+            return {"token": token}
+        await asyncio.sleep(max(_submissions[token]["ready_at"] - time.monotonic(), 0))
+        return result(token)
+
+    @app.post("/submissions/batch", status_code=201)
+    async def create_batch(request: Request):
+        return [{"token": submit(s)} for s in (await request.json())["submissions"]]
+
+    @app.get("/submissions/batch")
+    def get_batch(tokens: str = Query(...)):
+        return {"submissions": [result(t) for t in tokens.split(",")]}
+
+    @app.get("/submissions/{token}")
+    def get_submission(token: str):
+        return result(token)
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=2358)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency), host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,117 @@
+import io
+import zipfile
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterator, List
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported on first upload, it is slow to load
+
+# Rows per chunk. Each chunk costs a handful of IN (...) queries, so keep it
+# under SQLite's bound-parameter limit.
+CHUNK_SIZE = 500
+DEFAULT_PASSWORD = "pass123"
+
+
+class BulkAdmitError(Exception):
+    pass
+
+
+def _read_chunks(fileobj: BinaryIO, filename: str) -> Iterator["pd.DataFrame"]:
+    import pandas as pd
+    # pandas reports unreadable files as ValueError (bad encoding, ragged CSV
+    # rows, unknown format); openpyxl rejects a broken .xlsx as a bad zip.
+    try:
+        if filename.lower().endswith(".csv"):
+            yield from pd.read_csv(fileobj, chunksize=CHUNK_SIZE, dtype=str)
+            return
+        # Excel has no streaming reader; load once and slice.
+        df = pd.read_excel(io.BytesIO(fileobj.read()), dtype=str)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise BulkAdmitError(f"Invalid file: {e}") from e
+    for start in range(0, len(df), CHUNK_SIZE):
+        yield df.iloc[start:start + CHUNK_SIZE]
+
+
+def _normalise(chunk: "pd.DataFrame", row_offset: int) -> "pd.DataFrame":
+    import pandas as pd
+    chunk = chunk.rename(columns=lambda c: str(c).lower().strip())
+    if "email" not in chunk.columns:
+        raise BulkAdmitError("Missing 'email' column")
+    out = pd.DataFrame({
+        # 1-based row numbers as the instructor sees them in the sheet (header is row 1)
+        "row": range(row_offset + 2, row_offset + 2 + len(chunk)),
+        "email": chunk["email"].fillna("").astype(str).str.strip(),
+    })
+    # Logins are case-sensitive, so new accounts keep the address as written;
+    # the lowercased key only matches rows and existing users.
+    out["key"] = out["email"].str.lower()
+    names = chunk["name"] if "name" in chunk.columns else pd.Series(index=chunk.index, dtype=object)
+    out["name"] = names.fillna("Student").astype(str).str.strip().replace("", "Student").values
+    return out
+
+
+def admit_from_file(db: Session, fileobj: BinaryIO, filename: str, course_id: int, password_hash: str) -> Dict:
+    """Enroll every student listed in a CSV/XLSX upload into ``course_id``.
+
+    The file is processed in chunks of ``CHUNK_SIZE`` rows; each chunk resolves
+    existing users and enrollments with IN queries and writes new rows with bulk
+    inserts. The whole file is one transaction, committed at the end, so an
+    upload that fails part way admits nobody and can simply be sent again.
+    New accounts share ``password_hash``.
+    """
+    results: List[Dict] = []
+    seen = set()
+    offset = 0
+    for raw in _read_chunks(fileobj, filename):
+        chunk = _normalise(raw, offset)
+        offset += len(raw)
+
+        invalid = (chunk["email"] == "") | (chunk["key"] == "nan") | ~chunk["email"].str.contains("@", regex=False)
+        dupes = chunk["key"].duplicated() | chunk["key"].isin(seen)
+        for row, email in chunk.loc[invalid, ["row", "email"]].itertuples(index=False):
+            results.append({"row": row, "email": email, "status": "skipped", "reason": "invalid email"})
+        for row, email in chunk.loc[dupes & ~invalid, ["row", "email"]].itertuples(index=False):
+            results.append({"row": row, "email": email, "status": "skipped", "reason": "duplicate in file"})
+
+        valid = chunk[~invalid & ~dupes]
+        if valid.empty:
+            continue
+        keys = valid["key"].tolist()
+        seen.update(keys)
+
+        # Existing accounts match case-insensitively; the oldest wins if several differ only in case.
+        user_ids = dict(db.query(func.lower(models.User.email), models.User.id).filter(func.lower(models.User.email).in_(keys))
+                        .order_by(models.User.id.desc()).all())
+        new_users = valid[~valid["key"].isin(list(user_ids))]
+        if not new_users.empty:
+            db.execute(models.User.__table__.insert(), [
+                {"email": e, "full_name": n, "hashed_password": password_hash, "role": "student"}
+                for e, n in new_users[["email", "name"]].itertuples(index=False)
+            ])
+            user_ids.update((e.lower(), uid) for e, uid in db.query(models.User.email, models.User.id).filter(models.User.email.in_(new_users["email"].tolist())))
+
+        enrolled = {uid for (uid,) in db.query(models.Enrollment.user_id).filter(
+            models.Enrollment.course_id == course_id, models.Enrollment.user_id.in_(list(user_ids.values()))
+        )}
+        created = set(new_users["key"])
+        to_enroll = []
+        for row, email, key in valid[["row", "email", "key"]].itertuples(index=False):
+            uid = user_ids[key]
+            if uid in enrolled:
+                results.append({"row": row, "email": email, "status": "already_enrolled"})
+                continue
+            to_enroll.append({"user_id": uid, "course_id": course_id})
+            results.append({"row": row, "email": email, "status": "created" if key in created else "enrolled"})
+        if to_enroll:
+            db.execute(models.Enrollment.__table__.insert(), to_enroll)
+    db.commit()
+
+    results.sort(key=lambda r: r["row"])
+    summary = {s: 0 for s in ("created", "enrolled", "already_enrolled", "skipped")}
+    for r in results:
+        summary[r["status"]] += 1
+    return {"summary": summary, "rows": results}
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after ``ttl`` seconds.
+
+    A ``ttl`` of 0 disables caching entirely, which is handy for benchmarks.
+    With ``maxbytes``, values must support ``len()`` and the cache also keeps
+    their total length under that many bytes.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, maxbytes: Optional[int] = None):
+        self.maxsize, self.ttl, self.maxbytes = maxsize, ttl, maxbytes
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+
+    def _weigh(self, value: Any) -> int:
+        return len(value) if self.maxbytes is not None else 0
+
+    def _drop(self, key: Hashable):
+        self.nbytes -= self._weigh(self._data.pop(key)[1])
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0 or (self.maxbytes is not None and len(value) > self.maxbytes):
+            return
+        with self._lock:
+            if key in self._data: self._drop(key)
+            self._data[key] = (time.monotonic() + ttl, value)
+            self.nbytes += self._weigh(value)
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self._drop(next(iter(self._data)))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data: return default
+            value = self._data[key][1]
+            self._drop(key)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """Collapses concurrent async work for the same key into one execution.
+
+    ``do()`` covers the common case. ``join``/``lead``/``finish`` let a caller
+    lead several keys at once, e.g. when the work is done as one batch.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def join(self, key: Hashable) -> Optional[asyncio.Future]:
+        return self._calls.get(key)
+
+    def lead(self, key: Hashable) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; don't warn about an unretrieved exception.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        return future
+
+    def finish(self, key: Hashable, result: Any = None, error: Optional[BaseException] = None):
+        future = self._calls.pop(key, None)
+        if future is None or future.done(): return
+        if error is not None: future.set_exception(error)
+        else: future.set_result(result)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self.join(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        self.lead(key)
+        try:
+            result = await fn()
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result)
+        return result
@@ -0,0 +1,63 @@
+import re
+from typing import List, Optional
+
+from sqlalchemy import column, table, text
+from sqlalchemy.orm import Session
+
+import models
+
+COURSE_FIELDS = ["id", "title", "description", "price", "image_url", "is_published", "instructor_id"]
+
+# Search goes through an index built by migration 0002: an FTS5 table on SQLite,
+# a GIN index over this expression on PostgreSQL (the query must match it).
+PG_SEARCH_VECTOR = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+
+class CatalogError(Exception):
+    pass
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields: return COURSE_FIELDS
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(wanted) - set(COURSE_FIELDS)
+    if unknown: raise CatalogError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    return ["id"] + [f for f in wanted if f != "id"]  # id is the cursor
+
+
+_courses_fts = table("courses_fts", column("rowid"))
+
+
+def apply_search(db: Session, query, q: str):
+    """Restrict ``query`` to courses matching ``q``; returns ``(query, id column to page on)``, or None if ``q`` has no terms."""
+    words = re.findall(r"\w+", q)
+    if not words: return None
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        # Quoted prefix terms, so user input can't form FTS5 syntax. Driving
+        # the join from the FTS table in rowid order lets a page stop early.
+        match = " ".join(f'"{w}"*' for w in words)
+        query = query.select_from(_courses_fts).join(models.Course, models.Course.id == _courses_fts.c.rowid) \
+            .filter(text("courses_fts MATCH :q").bindparams(q=match))
+        return query, _courses_fts.c.rowid
+    if dialect == "postgresql":
+        return query.filter(text(f"{PG_SEARCH_VECTOR} @@ plainto_tsquery('english', :q)").bindparams(q=" ".join(words))), models.Course.id
+    for w in words:
+        query = query.filter(models.Course.title.ilike(f"%{w}%") | models.Course.description.ilike(f"%{w}%"))
+    return query, models.Course.id
+
+
+def list_courses(db: Session, fields: List[str], limit: Optional[int] = None, after: Optional[int] = None,
+                 instructor_id: Optional[int] = None, q: Optional[str] = None):
+    """The catalog in id order, one page of it if ``limit`` is given; returns ``(rows, next_cursor)``."""
+    query, key = db.query(*[getattr(models.Course, f) for f in fields]), models.Course.id
+    searched = apply_search(db, query, q) if q is not None else None
+    if searched is not None: query, key = searched  # a q with no terms is no search at all
+    if instructor_id is not None: query = query.filter(models.Course.instructor_id == instructor_id)
+    else: query = query.filter(models.Course.is_published == True)
+    if after: query = query.filter(key > after)
+    rows = query.order_by(key).limit(limit + 1).all() if limit else query.order_by(key).all()
+    cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]; cursor = rows[-1].id
+    return [dict(zip(fields, r)) for r in rows], cursor
@@ -0,0 +1,179 @@
+import copy
+import io
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional, Tuple
+
+from cache import TTLCache
+
+CERT_CACHE_TTL = int(os.getenv("CERT_CACHE_TTL", str(24 * 3600)))
+CERT_WORKERS = int(os.getenv("CERT_WORKERS", str(os.cpu_count() or 2)))
+# A certificate is ~30 KB and re-rendering one takes a few ms, so keep the cache small.
+CERT_CACHE_MB = int(os.getenv("CERT_CACHE_MB", "16"))
+
+# reportlab is imported on first use, so workers that never render don't pay for it.
+PAGE_SIZE = (841.8897637795277, 595.2755905511812)  # landscape A4, in points
+INCH = 72.0
+BRAND_BLUE = (0/255, 94/255, 184/255)
+BRAND_GREEN = (135/255, 194/255, 50/255)
+
+# Rendered PDFs keyed by (user_id, course_id, student_name, course_name).
+cert_cache = TTLCache(maxsize=4096, ttl=CERT_CACHE_TTL, maxbytes=CERT_CACHE_MB * 1024 * 1024)
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+@lru_cache(maxsize=1)
+def _reportlab():
+    from reportlab import rl_config
+    from reportlab.pdfgen import canvas
+    # Embed image/page streams as binary. ASCII85 only matters for 7-bit transports
+    # and, in pure Python, encoding the logo dominated every render.
+    rl_config.useA85 = 0
+    return canvas
+
+
+@lru_cache(maxsize=1)
+def _logo():
+    """Resolve and decode the logo once per process; None if there is none."""
+    from reportlab.lib.utils import ImageReader
+    logo_path = "logo.png" if os.path.exists("logo.png") else "logo.jpg"
+    if not os.path.exists(logo_path): return None
+    try:
+        logo = ImageReader(logo_path)
+        logo.getRGBData()  # load now so every certificate reuses the image data
+        w, h = logo.getSize()
+        return logo, 1.5*INCH, 1.5*INCH*h/w
+    except Exception: return None
+
+
+@lru_cache(maxsize=1)
+def _logo_xobject():
+    """The logo as a PDF image object, built once; each certificate
+    registers a shallow copy sharing its stream. None if there is no logo or
+    it has an alpha channel (soft masks need drawImage's own handling)."""
+    logo = _logo()
+    if not logo or logo[0]._dataA is not None: return None
+    _reportlab()  # the stream is encoded now, so useA85 must already be off
+    from reportlab.pdfbase.pdfdoc import PDFImageXObject
+    xobj = PDFImageXObject("CertificateLogo", logo[0])
+    xobj.name, xobj.XObjects = "CertificateLogo", None  # as Canvas.drawImage sets them up
+    return xobj
+
+
+def warmup():
+    """Import reportlab and prepare the logo ahead of the first certificate."""
+    _reportlab(); _logo(); _logo_xobject()
+
+
+def _draw_logo(c, x: float, y: float, w: float, h: float):
+    # Canvas.drawImage would build the image object again for every PDF, md5
+    # of the decoded pixels included, over half of a render; this registers the
+    # shared one instead.
+    xobj = _logo_xobject()
+    if xobj is None:
+        c.drawImage(_logo()[0], x, y, width=w, height=h, mask='auto'); return
+    name = c._doc.getXObjectName(xobj.name)
+    if name not in c._doc.idToObject:
+        xobj = copy.copy(xobj)  # registering names the object, so each document gets its own
+        c._doc.Reference(xobj, name); c._doc.addForm(xobj.name, xobj)
+    c._currentPageHasImages = 1
+    c.saveState(); c.translate(x, y); c.scale(w, h); c._code.append(f"/{name} Do"); c.restoreState()
+    c._formsinuse.append(xobj.name)  # lists the image in the page's resources
+
+
+def _draw_template(c):
+    width, height = PAGE_SIZE
+    c.setStrokeColorRGB(*BRAND_BLUE); c.setLineWidth(5); c.rect(20, 20, width-40, height-40)
+    c.setStrokeColorRGB(*BRAND_GREEN); c.setLineWidth(2); c.rect(28, 28, width-56, height-56)
+    logo = _logo()
+    if logo:
+        _, w, h = logo
+        _draw_logo(c, (width - w) / 2, height - 130, w, h)
+    c.setFont("Helvetica-Bold", 40); c.setFillColorRGB(*BRAND_BLUE); c.drawCentredString(width/2, height - 180, "CERTIFICATE")
+    c.setFont("Helvetica", 16); c.setFillColorRGB(0, 0, 0); c.drawCentredString(width/2, height - 210, "OF COMPLETION")
+
+
+def render_certificate(student_name: str, course_name: str) -> bytes:
+    buffer = io.BytesIO()
+    c = _reportlab().Canvas(buffer, pagesize=PAGE_SIZE)
+    width, height = PAGE_SIZE
+    _draw_template(c)
+    c.setFont("Helvetica-BoldOblique", 32); c.setFillColorRGB(0, 0, 0); c.drawCentredString(width/2, height - 310, student_name)
+    c.setFont("Helvetica-Bold", 24); c.setFillColorRGB(*BRAND_BLUE); c.drawCentredString(width/2, height - 400, course_name)
+    c.showPage(); c.save()
+    return buffer.getvalue()
+
+
+def get_certificate(user_id: int, course_id: int, student_name: str, course_name: str) -> bytes:
+    key = (user_id, course_id, student_name, course_name)
+    pdf = cert_cache.get(key)
+    if pdf is None:
+        pdf = render_certificate(student_name, course_name)
+        cert_cache.set(key, pdf)
+    return pdf
+
+
+# --- 📦 BATCH ZIP ---
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Not fork: the API process has threads, and a forked child can inherit a lock held by one of them.
+        # forkserver is POSIX-only; Windows has spawn.
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(max_workers=CERT_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def _render_args(args: Tuple[str, str]) -> bytes:
+    return render_certificate(*args)
+
+
+class _ZipSink:
+    """Write-only file object that hands finished bytes back to the generator."""
+
+    def __init__(self): self._chunks = []
+    def write(self, data): self._chunks.append(bytes(data)); return len(data)
+    def flush(self): pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _filename(user_id: int, name: str) -> str:
+    return f"{user_id}_{re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_') or 'student'}.pdf"
+
+
+def stream_course_zip(course_id: int, course_name: str, students: Iterable[Tuple[int, str]]) -> Iterator[bytes]:
+    """Yield a ZIP of certificates for ``(user_id, full_name)`` pairs as it is built.
+
+    Cached certificates are reused; the rest are rendered on a process pool.
+    PDFs are already compressed, so entries are stored rather than deflated.
+    """
+    students = [(uid, name or "Student") for uid, name in students]
+    cached = {uid: cert_cache.get((uid, course_id, name, course_name)) for uid, name in students}
+    missing = [(uid, name) for uid, name in students if cached[uid] is None]
+    rendered = _get_pool().map(_render_args, [(name, course_name) for _, name in missing], chunksize=16)
+    fresh = iter(zip(missing, rendered))
+
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+        for uid, name in students:
+            pdf = cached[uid]
+            if pdf is None:
+                _, pdf = next(fresh)
+                cert_cache.set((uid, course_id, name, course_name), pdf)
+            zf.writestr(_filename(uid, name), pdf)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,80 @@
+import gzip
+import hmac
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+import models
+from cache import SingleFlight, TTLCache
+from database import SessionLocal
+
+try:
+    import brotli
+except ImportError:  # optional; gzip covers every browser
+    brotli = None
+
+# Per worker. Edits made through the API invalidate at once on the worker that
+# handled them; the TTL bounds how long other workers serve the old version.
+EXAM_CACHE_TTL = int(os.getenv("EXAM_CACHE_TTL", "300"))
+MIN_COMPRESS_SIZE = 512  # bytes; smaller bodies go out as-is
+
+
+@dataclass(frozen=True)
+class StartPayload:
+    """The ``/start`` response for one test, serialized and compressed once."""
+    pass_key: bytes
+    variants: Dict[str, bytes]  # content-coding -> body; "identity" is always present
+
+    def check(self, pass_key: str) -> bool:
+        return hmac.compare_digest(self.pass_key, pass_key.encode("utf-8"))
+
+    def encode_for(self, accept_encoding: str):
+        """Pick the smallest variant the client accepts; returns ``(coding, body)``."""
+        accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+        for coding in ("br", "gzip"):
+            if coding in self.variants and coding in accepted: return coding, self.variants[coding]
+        return "identity", self.variants["identity"]
+
+
+start_cache = TTLCache(maxsize=256, ttl=EXAM_CACHE_TTL)
+_flights = SingleFlight()
+
+
+def build_payload(test_id: int) -> Optional[StartPayload]:
+    db = SessionLocal()
+    try:
+        test = db.query(models.CodeTest.id, models.CodeTest.title, models.CodeTest.time_limit, models.CodeTest.pass_key) \
+            .filter(models.CodeTest.id == test_id).first()
+        if not test: return None
+        problems = db.query(models.Problem.id, models.Problem.title, models.Problem.description, models.Problem.test_cases) \
+            .filter(models.Problem.test_id == test_id).order_by(models.Problem.id).all()
+    finally:
+        db.close()
+    body = json.dumps({"id": test.id, "title": test.title, "time_limit": test.time_limit,
+                       "problems": [{"id": p.id, "title": p.title, "description": p.description, "test_cases": p.test_cases} for p in problems]},
+                      separators=(",", ":")).encode("utf-8")
+    variants = {"identity": body}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None: variants["br"] = brotli.compress(body, quality=9)  # 11 is seconds per MB
+    return StartPayload((test.pass_key or "").encode("utf-8"), variants)
+
+
+async def get_start_payload(test_id: int) -> Optional[StartPayload]:
+    """Cached payload; concurrent misses for one test share a single DB read."""
+    payload = start_cache.get(test_id)
+    if payload is not None: return payload
+
+    async def load():
+        payload = await run_in_threadpool(build_payload, test_id)
+        if payload is not None: start_cache.set(test_id, payload)
+        return payload
+    return await _flights.do(test_id, load)
+
+
+def invalidate(test_id: int):
+    """Call after a test or its problems change."""
+    start_cache.pop(test_id)
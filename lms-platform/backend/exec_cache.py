@@ -0,0 +1,160 @@
+"""Content-addressed cache of execution results.
+
+A result is keyed by a hash of everything that decides it: backend, language,
+source, stdin and the resource limits. Lookups go to an in-process LRU first,
+then to a small SQLite file that every worker on the host shares. Concurrent
+identical jobs are executed once.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import execution
+from cache import SingleFlight, TTLCache
+from execution import ExecutionBackend, Job
+
+EXEC_CACHE_SIZE = int(os.getenv("EXEC_CACHE_SIZE", "2048"))  # in-memory entries per worker; 0 disables the cache
+EXEC_CACHE_TTL = float(os.getenv("EXEC_CACHE_TTL", "86400"))  # seconds
+EXEC_CACHE_PATH = os.getenv("EXEC_CACHE_PATH", "./exec_cache.db")  # empty disables the shared tier
+EXEC_CACHE_DISK_SIZE = int(os.getenv("EXEC_CACHE_DISK_SIZE", "50000"))  # entries
+
+# Only outcomes that the same input always reproduces: Accepted, Wrong Answer,
+# Compilation Error and a non-zero exit. Time limits, signals and internal
+# errors depend on load and are always re-run.
+CACHEABLE_STATUSES = {3, 4, 6, 11}
+
+
+def job_key(job: Job) -> str:
+    material = [execution.EXECUTION_BACKEND, job.language_id, job.source_code, job.stdin,
+                execution.CPU_TIME_LIMIT, execution.WALL_TIME_LIMIT, execution.MEMORY_LIMIT, execution.OUTPUT_LIMIT]
+    return hashlib.sha256(json.dumps(material).encode("utf-8")).hexdigest()
+
+
+def cacheable(result: Dict) -> bool:
+    return (result.get("status") or {}).get("id") in CACHEABLE_STATUSES
+
+
+class DiskTier:
+    """Size-bounded LRU table in a SQLite file, safe to share between processes."""
+
+    PRUNE_EVERY = 256  # writes between evictions
+
+    def __init__(self, path: str = EXEC_CACHE_PATH, maxsize: int = EXEC_CACHE_DISK_SIZE, ttl: float = EXEC_CACHE_TTL):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, used_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_results_used_at ON results (used_at)")
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, used_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None: return None
+            if row[1] < now - self.ttl:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE results SET used_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO results (key, value, used_at) VALUES (?, ?, ?)", (key, json.dumps(value), time.time()))
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.maxsize,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedBackend(ExecutionBackend):
+    """Wraps another backend and answers repeated jobs from the cache."""
+
+    def __init__(self, backend: ExecutionBackend, memory_size: int = EXEC_CACHE_SIZE, disk_path: str = EXEC_CACHE_PATH):
+        self.backend = backend
+        self.memory = TTLCache(maxsize=memory_size, ttl=EXEC_CACHE_TTL)
+        self.disk = DiskTier(disk_path) if disk_path else None
+        self.counters: Counter = Counter()
+        self._flights = SingleFlight()
+
+    async def _lookup(self, key: str) -> Optional[Dict]:
+        result = self.memory.get(key)
+        if result is not None:
+            self.counters["memory_hits"] += 1
+            return result
+        if self.disk is not None:
+            result = await asyncio.to_thread(self.disk.get, key)
+            if result is not None:
+                self.counters["disk_hits"] += 1
+                self.memory.set(key, result)
+                return result
+        return None
+
+    async def _store(self, key: str, result: Dict):
+        if not cacheable(result):
+            self.counters["uncacheable"] += 1
+            return
+        self.memory.set(key, result)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, result)
+
+    async def run(self, job: Job) -> Dict:
+        return (await self.run_batch([job]))[0]
+
+    async def run_batch(self, jobs: List[Job]) -> List[Dict]:
+        keys = [job_key(job) for job in jobs]
+        results: List[Optional[Dict]] = [await self._lookup(key) for key in keys]
+        waiting, leading = {}, {}
+        for key, job, result in zip(keys, jobs, results):
+            if result is not None or key in waiting or key in leading: continue
+            future = self._flights.join(key)
+            if future is not None:
+                waiting[key] = future
+                self.counters["coalesced"] += 1
+            else:
+                self._flights.lead(key)
+                leading[key] = job
+                self.counters["misses"] += 1
+        done = {}
+        if leading:
+            try:
+                fresh = await self.backend.run_batch(list(leading.values()))
+            except BaseException as e:
+                for key in leading: self._flights.finish(key, error=e)
+                raise
+            for key, result in zip(leading, fresh):
+                await self._store(key, result)
+                self._flights.finish(key, result)
+                done[key] = result
+        for key, future in waiting.items():
+            done[key] = await asyncio.shield(future)
+        return [result if result is not None else done[key] for key, result in zip(keys, results)]
+
+    def stats(self) -> Dict:
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["coalesced"]
+        lookups = hits + self.counters["misses"]
+        return {**{k: self.counters[k] for k in ("memory_hits", "disk_hits", "coalesced", "misses", "uncacheable")},
+                "hit_rate": round(hits / lookups, 4) if lookups else None, "memory_entries": len(self.memory)}
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None: self.disk.clear()
+
+    async def aclose(self):
+        await self.backend.aclose()
+        if self.disk is not None: self.disk.close()
@@ -0,0 +1,423 @@
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import httpx
+
+try:
+    import resource
+except ImportError:  # Windows: only the wall-clock limit applies
+    resource = None
+
+# --- ⚙️ CONFIG ---
+EXECUTION_BACKEND = os.getenv("EXECUTION_BACKEND", "judge0")  # "judge0", or "local" to run code on this host (see LocalBackend)
+# How the local runner isolates code: "bwrap" (bubblewrap: own filesystem view,
+# no network, unprivileged uid), "user" (run as EXECUTION_SANDBOX_USER; needs
+# root, and the app directory must not be readable by that user), or "none"
+# (development only: code runs as the API's own user and can read its secrets).
+EXECUTION_SANDBOX = os.getenv("EXECUTION_SANDBOX", "bwrap")
+EXECUTION_SANDBOX_USER = os.getenv("EXECUTION_SANDBOX_USER", "nobody")
+SANDBOX_PYTHON = os.getenv("EXECUTION_PYTHON", sys.executable)  # must be readable inside the sandbox
+EXECUTION_WORKERS = int(os.getenv("EXECUTION_WORKERS", str(os.cpu_count() or 2)))
+EXECUTION_QUEUE_SIZE = int(os.getenv("EXECUTION_QUEUE_SIZE", "64"))
+CPU_TIME_LIMIT = float(os.getenv("EXECUTION_CPU_TIME_LIMIT", "2"))  # seconds
+WALL_TIME_LIMIT = float(os.getenv("EXECUTION_WALL_TIME_LIMIT", "5"))  # seconds
+MEMORY_LIMIT = int(os.getenv("EXECUTION_MEMORY_LIMIT_MB", "256")) * 1024 * 1024
+OUTPUT_LIMIT = int(os.getenv("EXECUTION_OUTPUT_LIMIT_KB", "64")) * 1024
+# RLIMIT_NPROC counts every process and thread of the uid, not just this run's,
+# so the default of 1 means submissions can't fork or start threads at all.
+PROCESS_LIMIT = int(os.getenv("EXECUTION_PROCESS_LIMIT", "1"))
+
+JUDGE0_URL = os.getenv("JUDGE0_URL", "https://judge0-ce.p.rapidapi.com")
+JUDGE0_API_KEY = os.getenv("JUDGE0_API_KEY", "0708d014ebmsh3e0532f99384efbp139119jsn3736fb5bd1c2")
+JUDGE0_HOST = os.getenv("JUDGE0_HOST", "judge0-ce.p.rapidapi.com")
+JUDGE0_MAX_CONCURRENCY = int(os.getenv("JUDGE0_MAX_CONCURRENCY", "16"))  # batches in flight
+JUDGE0_TIMEOUT = float(os.getenv("JUDGE0_TIMEOUT", "10"))  # per HTTP request
+JUDGE0_POLL_TIMEOUT = float(os.getenv("JUDGE0_POLL_TIMEOUT", "30"))  # per batch, until all results are in
+JUDGE0_BATCH_SIZE = 20  # Judge0's default MAX_SUBMISSION_BATCH_SIZE
+
+PYTHON = 71  # Judge0 language id for Python 3
+logger = logging.getLogger("lms.execution")
+
+# Judge0 status ids, so clients can treat both backends the same way.
+ACCEPTED = {"id": 3, "description": "Accepted"}
+TIME_LIMIT_EXCEEDED = {"id": 5, "description": "Time Limit Exceeded"}
+SIGSEGV = {"id": 7, "description": "Runtime Error (SIGSEGV)"}
+SIGXFSZ = {"id": 8, "description": "Runtime Error (SIGXFSZ)"}
+NZEC = {"id": 11, "description": "Runtime Error (NZEC)"}
+RUNTIME_OTHER = {"id": 12, "description": "Runtime Error (Other)"}
+INTERNAL_ERROR = {"id": 13, "description": "Internal Error"}
+
+
+class ExecutionError(Exception):
+    pass
+
+
+class UnsupportedLanguage(ExecutionError):
+    pass
+
+
+class QueueFull(ExecutionError):
+    pass
+
+
+@dataclass(frozen=True)
+class Job:
+    source_code: str
+    stdin: str = ""
+    language_id: int = PYTHON
+
+
+class ExecutionBackend:
+    """Runs submissions and returns Judge0-shaped result dicts."""
+
+    async def run(self, job: Job) -> Dict:
+        raise NotImplementedError
+
+    async def run_batch(self, jobs: List[Job]) -> List[Dict]:
+        return list(await asyncio.gather(*(self.run(job) for job in jobs)))
+
+    async def aclose(self):
+        pass
+
+
+# --- 🖥️ LOCAL RUNNER ---
+LANGUAGES = {
+    PYTHON: ("main.py", [SANDBOX_PYTHON, "-I", "-S", "main.py"]),
+}
+
+# Applies the limits, then execs the submission. Runs as the child's first
+# program, because preexec_fn is unsafe in a threaded process like ours.
+_LAUNCHER = """
+import os, resource, sys
+for name, soft, hard in LIMITS:
+    if hasattr(resource, name): resource.setrlimit(getattr(resource, name), (soft, hard))
+os.execv(sys.argv[1], sys.argv[1:])
+"""
+
+# Read-only system paths visible inside bubblewrap; the app directory is not among them.
+BWRAP_SYSTEM_PATHS = ["/usr", "/bin", "/lib", "/lib64", "/lib32", "/sbin", "/etc/alternatives", "/etc/ld.so.cache", "/etc/ld.so.conf"]
+SANDBOX_DIR = "/sandbox"
+SANDBOX_UID = 65534
+
+
+class SandboxUnavailable(ExecutionError):
+    pass
+
+
+def _sandbox_ids():
+    """uid and primary gid of EXECUTION_SANDBOX_USER."""
+    import pwd
+    try: entry = pwd.getpwnam(EXECUTION_SANDBOX_USER)
+    except KeyError: raise SandboxUnavailable(f"No such user: {EXECUTION_SANDBOX_USER}")
+    return entry.pw_uid, entry.pw_gid
+
+
+def check_sandbox():
+    """Raise SandboxUnavailable unless EXECUTION_SANDBOX can isolate code on this host."""
+    if EXECUTION_SANDBOX == "bwrap":
+        if not shutil.which("bwrap"): raise SandboxUnavailable("EXECUTION_SANDBOX=bwrap needs bubblewrap installed")
+    elif EXECUTION_SANDBOX == "user":
+        if not hasattr(os, "geteuid") or os.geteuid() != 0: raise SandboxUnavailable("EXECUTION_SANDBOX=user needs the API to run as root")
+        _sandbox_ids()
+        if os.stat(os.getcwd()).st_mode & 0o005:
+            logger.warning("⚠️ %s is readable by other users, so sandboxed code can read it", os.getcwd())
+    elif EXECUTION_SANDBOX == "none":
+        logger.warning("⚠️ EXECUTION_SANDBOX=none: submitted code runs as the API's user and can read its files and secrets")
+    else:
+        raise SandboxUnavailable(f"Unknown EXECUTION_SANDBOX {EXECUTION_SANDBOX!r}")
+
+
+def _launch_argv(argv: List[str], workdir: str) -> List[str]:
+    limits = [("RLIMIT_CPU", int(CPU_TIME_LIMIT), int(CPU_TIME_LIMIT) + 1), ("RLIMIT_AS", MEMORY_LIMIT, MEMORY_LIMIT),
+              ("RLIMIT_FSIZE", OUTPUT_LIMIT, OUTPUT_LIMIT), ("RLIMIT_CORE", 0, 0), ("RLIMIT_NPROC", PROCESS_LIMIT, PROCESS_LIMIT)]
+    launch = [SANDBOX_PYTHON, "-I", "-S", "-c", f"LIMITS = {limits!r}" + _LAUNCHER] + argv if resource else argv
+    if EXECUTION_SANDBOX != "bwrap": return launch
+    # New user, pid, network, ipc and uts namespaces; only system paths, the
+    # interpreter and the run's own directory are mounted. Everything in the
+    # pid namespace dies with its first process or with the API.
+    cmd = ["bwrap", "--unshare-all", "--die-with-parent", "--new-session", "--uid", str(SANDBOX_UID), "--gid", str(SANDBOX_UID)]
+    for path in BWRAP_SYSTEM_PATHS + [sys.base_prefix, os.path.dirname(os.path.realpath(SANDBOX_PYTHON))]:
+        cmd += ["--ro-bind-try", path, path]
+    cmd += ["--bind", workdir, SANDBOX_DIR, "--chdir", SANDBOX_DIR, "--proc", "/proc", "--dev", "/dev", "--tmpfs", "/tmp", "--"]
+    return cmd + launch
+
+
+def _read_capped(path: str) -> str:
+    with open(path, "rb") as f:
+        return f.read(OUTPUT_LIMIT).decode("utf-8", errors="replace")
+
+
+def run_in_sandbox(job: Job) -> Dict:
+    if job.language_id not in LANGUAGES:
+        raise UnsupportedLanguage(f"Unsupported language id {job.language_id}")
+    filename, argv = LANGUAGES[job.language_id]
+    workdir = tempfile.mkdtemp(prefix="run_")
+    try:
+        with open(os.path.join(workdir, filename), "w", encoding="utf-8") as f:
+            f.write(job.source_code)
+        user = {}
+        if EXECUTION_SANDBOX == "user":
+            uid, gid = _sandbox_ids()
+            user = {"user": uid, "group": gid, "extra_groups": []}
+            for path in (workdir, os.path.join(workdir, filename)): os.chown(path, uid, gid)
+        # Output goes to files so RLIMIT_FSIZE caps it without us reading pipes.
+        out_path, err_path = os.path.join(workdir, "stdout"), os.path.join(workdir, "stderr")
+        with open(out_path, "wb") as out, open(err_path, "wb") as err:
+            start = time.perf_counter()
+            proc = subprocess.Popen(
+                _launch_argv(argv, workdir), cwd=workdir, stdin=subprocess.PIPE, stdout=out, stderr=err,
+                env={"PATH": "/usr/local/bin:/usr/bin:/bin", "PYTHONIOENCODING": "utf-8"},
+                start_new_session=True, **user,
+            )
+            timed_out = False
+            try:
+                proc.communicate(job.stdin.encode("utf-8"), timeout=WALL_TIME_LIMIT)
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                proc.kill()
+                proc.wait()
+            finally:
+                # Whatever the program left running in its session goes too.
+                if hasattr(os, "killpg"):
+                    try: os.killpg(proc.pid, signal.SIGKILL)
+                    except (ProcessLookupError, PermissionError): pass
+            elapsed = time.perf_counter() - start
+
+        rc = proc.returncode
+        if timed_out or rc == -getattr(signal, "SIGXCPU", -1):
+            status = TIME_LIMIT_EXCEEDED
+        elif rc == 0:
+            status = ACCEPTED
+        elif rc == -getattr(signal, "SIGXFSZ", -1) or os.path.getsize(out_path) >= OUTPUT_LIMIT:
+            # CPython ignores SIGXFSZ, so an over-long write surfaces as a non-zero exit instead
+            status = SIGXFSZ
+        elif rc == -signal.SIGSEGV:
+            status = SIGSEGV
+        elif rc > 0:
+            status = NZEC
+        else:
+            status = RUNTIME_OTHER
+        return {
+            "stdout": _read_capped(out_path) or None,
+            "stderr": _read_capped(err_path) or None,
+            "compile_output": None,
+            "message": None if rc == 0 else f"Exited with code {rc}",
+            "status": status,
+            "time": f"{elapsed:.3f}",
+            "memory": None,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class LocalBackend(ExecutionBackend):
+    """Runs each submission in a resource-limited subprocess, isolated as
+    EXECUTION_SANDBOX says. Opt in with EXECUTION_BACKEND=local.
+
+    ``workers`` submissions run at once; up to ``queue_size`` more may wait.
+    Beyond that :class:`QueueFull` is raised so callers can shed load. A batch
+    takes as many free slots as it has jobs, at least one, and runs the rest
+    through those slots as they free up, so a batch larger than the free
+    queue waits its turn instead of being refused.
+    """
+
+    def __init__(self, workers: int = EXECUTION_WORKERS, queue_size: int = EXECUTION_QUEUE_SIZE):
+        check_sandbox()
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sandbox")
+        self._slots = threading.BoundedSemaphore(self.capacity)
+
+    def _acquire(self, n: int) -> int:
+        """Take up to ``n`` free slots at once; how many were taken."""
+        taken = 0
+        while taken < n and self._slots.acquire(blocking=False):
+            taken += 1
+        if not taken: raise QueueFull("Execution queue is full")
+        return taken
+
+    def _run(self, job: Job) -> Dict:
+        try:
+            return run_in_sandbox(job)
+        except UnsupportedLanguage:
+            raise
+        except Exception as e:
+            return {"stdout": None, "stderr": None, "compile_output": None, "message": str(e), "status": INTERNAL_ERROR, "time": None, "memory": None}
+
+    async def run(self, job: Job) -> Dict:
+        return (await self.run_batch([job]))[0]
+
+    async def run_batch(self, jobs: List[Job]) -> List[Dict]:
+        for job in jobs:
+            if job.language_id not in LANGUAGES:
+                raise UnsupportedLanguage(f"Unsupported language id {job.language_id}")
+        lanes = self._acquire(len(jobs))
+        todo, results = iter(enumerate(jobs)), [None] * len(jobs)
+
+        async def lane():
+            try:
+                for i, job in todo: results[i] = await asyncio.wrap_future(self._pool.submit(self._run, job))
+            finally:
+                self._slots.release()
+
+        await asyncio.gather(*(lane() for _ in range(lanes)))
+        return results
+
+    async def aclose(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- ☁️ JUDGE0 ---
+class Judge0Backend(ExecutionBackend):
+    """Async Judge0 client.
+
+    Uses one keep-alive connection pool and submits through the batch API.
+    Instead of holding a connection open with ``wait=true``, a single poller
+    task checks every outstanding token in batched GETs, backing off per token
+    from 50 ms to 1 s. At most ``max_concurrency`` HTTP requests are in flight;
+    an upstream 429 is reported as :class:`QueueFull`.
+    """
+
+    FIELDS = "token,stdout,stderr,compile_output,message,status,time,memory"
+    POLL_MIN, POLL_MAX = 0.05, 1.0
+
+    def __init__(self, url: str = JUDGE0_URL, api_key: str = JUDGE0_API_KEY, host: str = JUDGE0_HOST,
+                 max_concurrency: int = JUDGE0_MAX_CONCURRENCY, timeout: float = JUDGE0_TIMEOUT, poll_timeout: float = JUDGE0_POLL_TIMEOUT):
+        self.url, self.max_concurrency, self.timeout, self.poll_timeout = url, max_concurrency, timeout, poll_timeout
+        self.headers = {"X-RapidAPI-Key": api_key, "X-RapidAPI-Host": host} if api_key else {}
+        self._loop = None
+
+    def _bind(self):
+        # Connections, the semaphore and the poller belong to one event loop.
+        # uvicorn runs a single loop per worker; test clients may start several.
+        loop = asyncio.get_running_loop()
+        if self._loop is loop: return
+        self._loop = loop
+        self._client = httpx.AsyncClient(base_url=self.url, headers=self.headers, timeout=self.timeout,
+                                         limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency))
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._pending: Dict[str, list] = {}  # token -> [future, next poll at, delay, deadline]
+        self._poller: Optional[asyncio.Task] = None
+
+    async def run(self, job: Job) -> Dict:
+        return (await self.run_batch([job]))[0]
+
+    async def run_batch(self, jobs: List[Job]) -> List[Dict]:
+        self._bind()
+        chunks = [jobs[i:i + JUDGE0_BATCH_SIZE] for i in range(0, len(jobs), JUDGE0_BATCH_SIZE)]
+        try:
+            done = await asyncio.gather(*(self._run_chunk(chunk) for chunk in chunks))
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 429: raise QueueFull("Judge0 rate limit reached")
+            logger.error("Judge0 error: %s", e)
+            raise ExecutionError("Compiler Service Error")
+        except httpx.HTTPError as e:
+            logger.error("Judge0 error: %r", e)
+            raise ExecutionError("Compiler Service Error")
+        return [result for chunk in done for result in chunk]
+
+    async def _run_chunk(self, jobs: List[Job]) -> List[Dict]:
+        async with self._slots:
+            response = await self._client.post("/submissions/batch", params={"base64_encoded": "false"}, json={
+                "submissions": [{"source_code": j.source_code, "language_id": j.language_id, "stdin": j.stdin} for j in jobs]})
+        response.raise_for_status()
+        try: body = response.json()
+        except ValueError: body = None
+        if not isinstance(body, list) or len(body) != len(jobs) or not all(isinstance(entry, dict) for entry in body):
+            logger.error("Malformed Judge0 batch response: %.200s", response.text)
+            raise ExecutionError("Malformed response from Judge0")
+        tokens = [entry.get("token") if isinstance(entry.get("token"), str) else None for entry in body]
+        waiting = {t: self._watch(t) for t in tokens if t}
+        results = dict(zip(waiting, await asyncio.gather(*waiting.values())))
+        # Submissions Judge0 rejected come back without a token.
+        return [results[t] if t else {"stdout": None, "stderr": None, "compile_output": None, "message": "Rejected by Judge0",
+                                      "status": INTERNAL_ERROR, "time": None, "memory": None} for t in tokens]
+
+    def _watch(self, token: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[token] = [future, loop.time() + self.POLL_MIN, self.POLL_MIN, loop.time() + self.poll_timeout]
+        if self._poller is None or self._poller.done():
+            self._poller = loop.create_task(self._poll_loop())
+        return future
+
+    async def _poll_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            now = loop.time()
+            # Also expire tokens whose polls keep failing or never get an answer.
+            for t, (future, _, _, deadline) in list(self._pending.items()):
+                if now > deadline:
+                    del self._pending[t]
+                    if not future.done(): future.set_exception(ExecutionError("Timed out waiting for Judge0"))
+            if not self._pending: break
+            due = [t for t, (_, at, _, _) in self._pending.items() if at <= now]
+            if not due:
+                await asyncio.sleep(min(min(p[1] for p in self._pending.values()) - now, self.POLL_MIN))
+                continue
+            await asyncio.gather(*(self._poll(due[i:i + JUDGE0_BATCH_SIZE]) for i in range(0, len(due), JUDGE0_BATCH_SIZE)))
+
+    async def _poll(self, tokens: List[str]):
+        try:
+            async with self._slots:
+                response = await self._client.get("/submissions/batch", params={"tokens": ",".join(tokens), "base64_encoded": "false", "fields": self.FIELDS})
+            response.raise_for_status()
+            submissions = response.json()["submissions"]
+            finished = {sub["token"]: sub for sub in submissions
+                        if sub and (sub.get("status") or {}).get("id", 0) > 2}  # 1 In Queue, 2 Processing
+        except Exception as e:
+            # Anything else would end the shared poller and strand every waiting run().
+            logger.error("Polling Judge0 for %d token(s) failed: %r", len(tokens), e)
+            for t in tokens:
+                entry = self._pending.pop(t, None)
+                if entry and not entry[0].done(): entry[0].set_exception(ExecutionError("Compiler Service Error"))
+            return
+        now = asyncio.get_running_loop().time()
+        for t in tokens:
+            entry = self._pending.get(t)
+            if entry is None: continue
+            future = entry[0]
+            if future.done():  # caller went away
+                del self._pending[t]
+            elif t in finished:
+                del self._pending[t]; future.set_result(finished[t])
+            elif now > entry[3]:
+                del self._pending[t]; future.set_exception(ExecutionError("Timed out waiting for Judge0"))
+            else:
+                entry[2] = min(entry[2] * 2, self.POLL_MAX); entry[1] = now + entry[2]
+
+    async def aclose(self):
+        if self._loop is not asyncio.get_running_loop(): return
+        if self._poller: self._poller.cancel()
+        await self._client.aclose()
+
+
+_backend: Optional[ExecutionBackend] = None
+
+
+def get_backend() -> ExecutionBackend:
+    global _backend
+    if _backend is None:
+        _backend = LocalBackend() if EXECUTION_BACKEND == "local" else Judge0Backend()
+        from exec_cache import EXEC_CACHE_SIZE, CachedBackend  # imports this module
+        if EXEC_CACHE_SIZE > 0:
+            _backend = CachedBackend(_backend)
+    return _backend
+
+
+async def shutdown():
+    global _backend
+    if _backend is not None:
+        await _backend.aclose()
+        _backend = None
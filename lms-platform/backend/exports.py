@@ -0,0 +1,67 @@
+import csv
+import io
+import os
+import tempfile
+from typing import Iterator
+
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+RESULT_COLUMNS = ["student_name", "email", "score", "problems_solved", "time_taken", "submitted_at"]
+BATCH_SIZE = 1000
+
+
+def results_query(db: Session, test_id: int):
+    """TestResult rows for a test joined to their student, in id order."""
+    return db.query(models.TestResult.id, models.User.full_name, models.User.email, models.TestResult.score,
+                    models.TestResult.problems_solved, models.TestResult.time_taken, models.TestResult.submitted_at) \
+        .join(models.User, models.User.id == models.TestResult.user_id) \
+        .filter(models.TestResult.test_id == test_id).order_by(models.TestResult.id)
+
+
+def result_row(r) -> list:
+    return [r.full_name, r.email, r.score, r.problems_solved, r.time_taken, r.submitted_at.strftime("%Y-%m-%d %H:%M") if r.submitted_at else None]
+
+
+def _stream(test_id: int):
+    # The response outlives the request's session, so exports open their own.
+    # yield_per streams rows from a server-side cursor instead of loading them all.
+    db = SessionLocal()
+    try:
+        yield from results_query(db, test_id).yield_per(BATCH_SIZE)
+    finally:
+        db.close()
+
+
+def iter_results_csv(test_id: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RESULT_COLUMNS)
+    for i, r in enumerate(_stream(test_id), 1):
+        writer.writerow(result_row(r))
+        if i % BATCH_SIZE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0); buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def iter_results_xlsx(test_id: int) -> Iterator[bytes]:
+    # XLSX is a zip that can only be finished at the end, so build it with
+    # openpyxl's write-only mode (rows go to disk, not memory) and stream the file.
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Results")
+    ws.append(RESULT_COLUMNS)
+    for r in _stream(test_id):
+        ws.append(result_row(r))
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        wb.save(path)
+        with open(path, "rb") as f:
+            while chunk := f.read(64 * 1024):
+                yield chunk
+    finally:
+        os.remove(path)
@@ -0,0 +1,56 @@
+import json
+from typing import Dict, List
+
+import execution
+
+WRONG_ANSWER = {"id": 4, "description": "Wrong Answer"}
+
+
+def parse_test_cases(raw: str) -> List[Dict]:
+    """Decode a ``Problem.test_cases`` JSON string into ``[{"input", "output"}]``."""
+    try:
+        cases = json.loads(raw or "[]")
+    except ValueError:
+        return []
+    return [{"input": str(c.get("input", "")), "output": str(c.get("output", ""))} for c in cases if isinstance(c, dict)]
+
+
+def _normalise_output(text: str) -> str:
+    return "\n".join(line.rstrip() for line in (text or "").strip().splitlines())
+
+
+def verdict(case: Dict, result: Dict) -> Dict:
+    status = result.get("status") or execution.INTERNAL_ERROR
+    passed = status.get("id") == execution.ACCEPTED["id"] and _normalise_output(result.get("stdout")) == _normalise_output(case["output"])
+    if status.get("id") == execution.ACCEPTED["id"] and not passed:
+        status = WRONG_ANSWER
+    return {"passed": passed, "status": status, "time": result.get("time"), "stdout": result.get("stdout"), "stderr": result.get("stderr")}
+
+
+async def grade(problems: Dict[int, List[Dict]], solutions: Dict[int, execution.Job]) -> Dict:
+    """Run every test case of every solved problem in one parallel batch.
+
+    ``problems`` maps problem id to its parsed test cases and ``solutions`` maps
+    problem id to the submitted job (its ``stdin`` is replaced per case).
+    Score is the share of passed cases averaged over the problems that have
+    cases, out of 100; a problem without cases can't be failed and doesn't count.
+    """
+    keys, jobs = [], []
+    for pid, job in solutions.items():
+        for i, case in enumerate(problems.get(pid, [])):
+            keys.append((pid, i))
+            jobs.append(execution.Job(job.source_code, case["input"], job.language_id))
+    results = await execution.get_backend().run_batch(jobs) if jobs else []
+
+    report = {pid: [] for pid in problems}
+    for (pid, i), result in zip(keys, results):
+        report[pid].append({"case": i, **verdict(problems[pid][i], result)})
+
+    per_problem, total, solved, graded = [], 0.0, 0, 0
+    for pid, cases in problems.items():
+        passed = sum(v["passed"] for v in report[pid])
+        if cases and passed == len(cases): solved += 1
+        if cases: total += passed / len(cases); graded += 1
+        per_problem.append({"problem_id": pid, "passed": passed, "total": len(cases), "cases": report[pid]})
+    score = round(100 * total / graded) if graded else 0
+    return {"score": score, "problems_solved": solved, "problems": per_problem}
@@ -0,0 +1,26 @@
+"""Production server settings.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+PRELOAD_APP=1 imports and warms the app once in the master process (see
+main.warmup), so forked workers start serving immediately and share the
+loaded modules copy-on-write. Run `python manage.py migrate` first.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 2)))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_APP", "0") == "1"
+
+
+def when_ready(server):
+    if preload_app:
+        import main
+        main.warmup()
+
+
+def post_fork(server, worker):
+    # Connections the master opened while warming up must not be shared across processes.
+    from database import engine
+    engine.dispose(close=False)
@@ -0,0 +1,308 @@
+"""Write-behind ingestion of test results.
+
+A submission is acknowledged once it is appended to a local journal and
+fsynced; concurrent appends share one fsync. A flusher thread then writes the
+queued results to ``test_results`` in batches, one transaction per batch,
+instead of one commit per request fighting for the SQLite write lock.
+
+Rows are unique per (test_id, user_id): a student's first submission counts.
+``submit`` refuses a repeat with AlreadySubmitted (checked against the table
+and what this process still has queued), and rows are inserted with ON
+CONFLICT DO NOTHING, so a race between workers or replaying a journal is
+harmless.
+Each worker process owns one journal, a few segment files it holds locks on;
+on start, segments whose lock is free (their process died) are replayed and
+removed.
+
+A batch that keeps failing is retried row by row, and rows that still fail
+(a missing user, say) are appended to ``dead-letter.jsonl`` with the error
+instead of blocking everything behind them; ``python manage.py ingest-retry``
+tries them again. Ingestion refuses to start while migrations are pending.
+"""
+import glob
+import importlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: journals are not locked, so only run one worker
+    fcntl = None
+
+import leaderboard
+import live
+import migrations
+import models
+from database import SessionLocal
+
+INGEST_DIR = os.getenv("INGEST_DIR", "./ingest")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))  # rows per group commit
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.05"))  # seconds a row may wait for its batch
+INGEST_RETRIES = int(os.getenv("INGEST_RETRIES", "3"))  # attempts per batch before going row by row
+INGEST_SEGMENT_BYTES = int(os.getenv("INGEST_SEGMENT_BYTES", str(1024 * 1024)))  # journal segment size before rotating
+RETRY_DELAY = 1.0
+DEAD_LETTER = "dead-letter.jsonl"
+
+logger = logging.getLogger("lms.ingest")
+RESULT_FIELDS = ("test_id", "user_id", "score", "problems_solved", "time_taken", "submitted_at")
+
+
+class IngestUnavailable(Exception):
+    pass
+
+
+class AlreadySubmitted(Exception):
+    pass
+
+
+def has_result(test_id: int, user_id: int) -> bool:
+    with SessionLocal() as db:
+        return db.query(models.TestResult.id).filter(models.TestResult.test_id == test_id, models.TestResult.user_id == user_id).first() is not None
+
+
+def insert_results(conn, rows: List[Dict]) -> List[tuple]:
+    """Insert TestResult rows, skipping any (test_id, user_id) that already has one; returns ``(id, test_id)`` of those inserted."""
+    if not rows: return []
+    table = models.TestResult.__table__
+    if conn.dialect.name in ("sqlite", "postgresql"):
+        dialect = importlib.import_module(f"sqlalchemy.dialects.{conn.dialect.name}")
+        stmt = dialect.insert(table).on_conflict_do_nothing(index_elements=["test_id", "user_id"]).returning(table.c.id, table.c.test_id)
+        return [tuple(r) for r in conn.execute(stmt, rows)]
+    inserted = []
+    for row in rows:
+        exists = conn.execute(table.select().with_only_columns(table.c.id).where(table.c.test_id == row["test_id"], table.c.user_id == row["user_id"])).first()
+        if not exists: inserted.append((conn.execute(table.insert(), row).inserted_primary_key[0], row["test_id"]))
+    return inserted
+
+
+def _to_row(record: Dict) -> Dict:
+    row = {k: record[k] for k in RESULT_FIELDS}
+    row["submitted_at"] = datetime.fromisoformat(row["submitted_at"])
+    return row
+
+
+class Journal:
+    """Append-only JSON-lines log split into numbered segment files. ``append``
+    returns once the line is on disk.
+
+    When the current segment grows past ``segment_bytes`` the next append goes
+    to a new one, and ``release`` deletes segments whose records have all been
+    flushed, so the journal stays small even if it is never fully drained.
+    """
+
+    def __init__(self, prefix: str, segment_bytes: int = INGEST_SEGMENT_BYTES):
+        self.prefix, self.segment_bytes = prefix, segment_bytes
+        self._sealed: List[tuple] = []  # (path, file, last seq) of full segments, oldest first
+        self._next_segment = 0
+        self._open_segment()
+        self._cond = threading.Condition()
+        self.written = self._synced = 0
+        self._syncing = False
+
+    def _open_segment(self):
+        self.path = f"{self.prefix}-{self._next_segment:04d}.jsonl"
+        self._next_segment += 1
+        self._file = open(self.path, "a", encoding="utf-8")
+        if fcntl: fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def append(self, record: Dict) -> int:
+        with self._cond:
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self.written += 1; seq = self.written
+            # Group fsync: one thread syncs everything written so far while
+            # the others wait for it instead of queueing their own.
+            while self._synced < seq:
+                if self._syncing: self._cond.wait(); continue
+                self._syncing, target = True, self.written
+                self._file.flush()
+                self._cond.release()
+                try:
+                    os.fsync(self._file.fileno())
+                finally:
+                    self._cond.acquire()
+                    self._syncing = False
+                    self._cond.notify_all()
+                self._synced = target
+            return seq
+
+    def release(self, flushed: int) -> bool:
+        """Discard records up to ``flushed`` once nothing else in their segment is pending; True if the journal is now empty."""
+        with self._cond:
+            while self._sealed and self._sealed[0][2] <= flushed:
+                path, f, _ = self._sealed.pop(0)
+                f.close(); os.remove(path)
+            if self._syncing: return False  # the current file is being fsynced outside the lock
+            if flushed >= self.written:
+                if self._file.tell(): self._file.flush(); self._file.truncate(0); os.fsync(self._file.fileno())
+                return True
+            if self._file.tell() >= self.segment_bytes:
+                # Seal the segment durably, so nothing appended to it waits on a sync of the next one.
+                self._file.flush(); os.fsync(self._file.fileno()); self._synced = self.written
+                self._sealed.append((self.path, self._file, self.written))
+                self._open_segment()
+            return False
+
+    def close(self, remove: bool = False):
+        with self._cond:
+            for path, f in [(p, f) for p, f, _ in self._sealed] + [(self.path, self._file)]:
+                f.close()
+                if remove: os.remove(path)
+
+
+def replay_orphans(directory: str = INGEST_DIR, exclude: Optional[str] = None) -> int:
+    """Flush journals left by dead processes, skipping segments whose path starts with ``exclude``; returns the number of records replayed."""
+    replayed = 0
+    for path in sorted(glob.glob(os.path.join(directory, "journal-*.jsonl"))):
+        if exclude and path.startswith(exclude): continue
+        with open(path, "r+", encoding="utf-8") as f:
+            if fcntl:
+                try: fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError: continue  # its worker is alive
+            records = []
+            for line in f:
+                try: records.append(json.loads(line))
+                except ValueError: break  # torn last line; it was never acknowledged
+            flush(records, directory)
+            replayed += len(records)
+            os.remove(path)
+    if replayed: logger.warning("Replayed %d journaled submission(s)", replayed)
+    return replayed
+
+
+def _dead_letter(directory: str, failed: List[tuple]):
+    with open(os.path.join(directory, DEAD_LETTER), "a", encoding="utf-8") as f:
+        for record, error in failed: f.write(json.dumps({**record, "error": error}, separators=(",", ":")) + "\n")
+        f.flush(); os.fsync(f.fileno())
+
+
+def flush(records: List[Dict], directory: str = INGEST_DIR, retries: int = INGEST_RETRIES) -> int:
+    """Write ``records``, dead-lettering any that can't be inserted on their own; returns how many were dead-lettered."""
+    for attempt in range(retries):
+        try:
+            _flush_records(records)
+            return 0
+        except Exception:
+            logger.exception("Flushing %d submission(s) failed (attempt %d of %d)", len(records), attempt + 1, retries)
+            if attempt + 1 < retries: time.sleep(RETRY_DELAY)
+    failed = []
+    for record in records:
+        try: _flush_records([record])
+        except Exception as e: failed.append((record, f"{type(e).__name__}: {e}"))
+    if failed:
+        _dead_letter(directory, failed)
+        logger.error("Moved %d submission(s) to %s", len(failed), os.path.join(directory, DEAD_LETTER))
+    return len(failed)
+
+
+def retry_dead_letters(directory: str = INGEST_DIR) -> tuple:
+    """Flush the dead-letter file again; returns ``(retried, still failing)``."""
+    path = os.path.join(directory, DEAD_LETTER)
+    if not os.path.exists(path): return 0, 0
+    retrying = path + ".retry"
+    os.replace(path, retrying)  # rows failing again are appended to a fresh file
+    with open(retrying, encoding="utf-8") as f:
+        records = [{k: v for k, v in json.loads(line).items() if k != "error"} for line in f if line.strip()]
+    failed = flush(records, directory, retries=1)
+    os.remove(retrying)
+    return len(records), failed
+
+
+def _flush_records(records: List[Dict]):
+    for start in range(0, len(records), INGEST_BATCH_SIZE):
+        batch = records[start:start + INGEST_BATCH_SIZE]
+        with SessionLocal() as db:
+            inserted = insert_results(db.connection(), [_to_row(r) for r in batch])
+            db.commit()
+            if len(inserted) < len(batch): logger.info("Skipped %d repeat submission(s)", len(batch) - len(inserted))
+            for test_id in {r["test_id"] for r in batch}: leaderboard.record_result(db, test_id)
+            try: live.publish_results(db, inserted)
+            except Exception: logger.exception("Publishing %d result(s) failed", len(inserted))  # committed; watchers catch up
+
+
+class Ingestor:
+    def __init__(self, directory: str = INGEST_DIR, batch_size: int = INGEST_BATCH_SIZE, interval: float = INGEST_FLUSH_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory, self.batch_size, self.interval = directory, batch_size, interval
+        self.journal = Journal(os.path.join(directory, f"journal-{os.getpid()}-{int(time.time() * 1000)}"))
+        replay_orphans(directory, exclude=self.journal.prefix)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._queued = set()  # (test_id, user_id) accepted but not yet flushed
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ingest-flusher", daemon=True)
+        self._thread.start()
+
+    def submit(self, test_id: int, user_id: int, score: int, problems_solved: int, time_taken: str):
+        """Durably queue a result, or raise AlreadySubmitted. Blocks for the journal fsync, so call it off the event loop."""
+        key = (test_id, user_id)
+        with self._lock:
+            if key in self._queued: raise AlreadySubmitted(f"Test {test_id} already submitted")
+            self._queued.add(key)
+        record = {"test_id": test_id, "user_id": user_id, "score": score, "problems_solved": problems_solved,
+                  "time_taken": time_taken, "submitted_at": datetime.utcnow().isoformat()}
+        try:
+            if has_result(test_id, user_id): raise AlreadySubmitted(f"Test {test_id} already submitted")
+            seq = self.journal.append(record)
+        except BaseException:
+            with self._lock: self._queued.discard(key)
+            raise
+        self._queue.put((seq, record))
+
+    def _next_batch(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0: break
+            try: batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty: break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch[-1] is None:  # stop marker
+                batch.pop()
+                if batch: self._flush(batch)
+                return
+            self._flush(batch)
+
+    def _flush(self, batch: List[tuple]):
+        flush([record for _, record in batch], self.directory)
+        with self._lock:
+            self._queued.difference_update((r["test_id"], r["user_id"]) for _, r in batch)
+        self.journal.release(batch[-1][0])
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self.journal.close(remove=self._queue.empty() and self.journal.release(self.journal.written))
+
+
+_ingestor: Optional[Ingestor] = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor() -> Ingestor:
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            # Rows written against an old schema would fail (no unique index to conflict on), so wait for the migration.
+            todo = migrations.pending()
+            if todo: raise IngestUnavailable(f"Migrations pending: {', '.join(todo)}")
+            _ingestor = Ingestor()
+        return _ingestor
+
+
+def shutdown():
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is not None:
+            _ingestor.close()
+            _ingestor = None
@@ -0,0 +1,189 @@
+"""Per-request latency and SQL accounting, exported in Prometheus text format.
+
+``PerfMiddleware`` times every request and, through SQLAlchemy engine events,
+counts the statements it runs and the time spent in them. Totals are kept per
+route template (``/api/v1/courses/{course_id}/player``), so path parameters
+don't multiply the series. Slow or query-heavy requests are logged together
+with their statements, which is how N+1 lazy loads show up.
+
+Tests can bound the queries of a block::
+
+    with assert_max_queries(3):
+        client.get("/api/v1/my-courses", headers=headers)
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+QUERY_COUNT_THRESHOLD = int(os.getenv("QUERY_COUNT_THRESHOLD", "20"))
+MAX_LOGGED_STATEMENTS = 50
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger("lms.perf")
+
+
+class QueryStats:
+    """Statements run within one request (or one ``capture_queries`` block)."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: List[tuple] = []  # (seconds, sql), capped
+
+    def add(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        if len(self.statements) < MAX_LOGGED_STATEMENTS: self.statements.append((seconds, statement))
+
+    def describe(self) -> str:
+        lines = [f"  {s * 1000:7.2f} ms  {' '.join(sql.split())}" for s, sql in self.statements]
+        if self.count > len(self.statements): lines.append(f"  ... {self.count - len(self.statements)} more")
+        return "\n".join(lines)
+
+
+# The request's stats. Threadpool endpoints run in a copy of the request's
+# context, so they add to the same object.
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# capture_queries() blocks see every statement, whatever thread runs it.
+_captures: List[QueryStats] = []
+
+
+def install_engine_hooks(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _current.get()
+        if stats is not None: stats.add(statement, elapsed)
+        for capture in list(_captures): capture.add(statement, elapsed)
+
+
+# --- 📈 METRICS ---
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines, total = [], 0
+        for bound, count in zip([*self.buckets, "+Inf"], self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+        return lines + [f"{name}_sum{{{labels}}} {self.sum}", f"{name}_count{{{labels}}} {total}"]
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.statuses: Dict[int, int] = {}
+
+
+_routes: Dict[tuple, RouteMetrics] = {}
+_routes_lock = threading.Lock()
+
+
+def record(method: str, route: str, status: int, seconds: float, stats: QueryStats):
+    with _routes_lock:
+        m = _routes.get((method, route))
+        if m is None: m = _routes[(method, route)] = RouteMetrics()
+        m.latency.observe(seconds)
+        m.queries.observe(stats.count)
+        m.db_seconds += stats.seconds
+        m.statuses[status] = m.statuses.get(status, 0) + 1
+
+
+def render_metrics() -> str:
+    out = ["# HELP lms_http_request_duration_seconds Request latency by route.", "# TYPE lms_http_request_duration_seconds histogram"]
+    with _routes_lock:
+        routes = sorted(_routes.items())
+        for (method, route), m in routes:
+            out += m.latency.render("lms_http_request_duration_seconds", f'method="{method}",route="{route}"')
+        out += ["# HELP lms_http_requests_total Requests by route and status.", "# TYPE lms_http_requests_total counter"]
+        for (method, route), m in routes:
+            out += [f'lms_http_requests_total{{method="{method}",route="{route}",status="{s}"}} {n}' for s, n in sorted(m.statuses.items())]
+        out += ["# HELP lms_db_queries_per_request SQL statements per request by route.", "# TYPE lms_db_queries_per_request histogram"]
+        for (method, route), m in routes:
+            out += m.queries.render("lms_db_queries_per_request", f'method="{method}",route="{route}"')
+        out += ["# HELP lms_db_seconds_total Time spent in SQL by route.", "# TYPE lms_db_seconds_total counter"]
+        for (method, route), m in routes:
+            out.append(f'lms_db_seconds_total{{method="{method}",route="{route}"}} {m.db_seconds}')
+    return "\n".join(out) + "\n"
+
+
+def reset_metrics():
+    with _routes_lock:
+        _routes.clear()
+
+
+# --- ⏱️ MIDDLEWARE ---
+class PerfMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed until their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats, status, event_stream = QueryStats(), 500, False
+        token = _current.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status, event_stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                event_stream = any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message.get("headers", ()))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            if not event_stream:  # SSE streams are open-ended by design (see live.py); their duration is not latency
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                record(scope["method"], route, status, elapsed, stats)
+                if elapsed * 1000 >= SLOW_REQUEST_MS or stats.count > QUERY_COUNT_THRESHOLD:
+                    logger.warning("%s %s -> %s in %.1f ms, %d queries (%.1f ms in SQL)\n%s", scope["method"], scope["path"], status,
+                                   elapsed * 1000, stats.count, stats.seconds * 1000, stats.describe())
+
+
+# --- 🧪 TEST HELPERS ---
+@contextmanager
+def capture_queries():
+    """Collect every SQL statement run while the block is active."""
+    stats = QueryStats()
+    _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _captures.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    with capture_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        raise AssertionError(f"Expected at most {limit} queries, got {stats.count}:\n{stats.describe()}")
@@ -0,0 +1,146 @@
+import bisect
+import math
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+import models
+
+# Boards re-read new TestResult rows at most this often when only queried;
+# submissions always sync immediately.
+SYNC_INTERVAL = float(os.getenv("LEADERBOARD_SYNC_INTERVAL", "1"))
+# Ids below the watermark that are re-read on each sync. Covers rows that
+# commit out of id order on databases with concurrent writers (PostgreSQL);
+# re-applying a row is a no-op.
+SYNC_OVERLAP = 100
+HISTOGRAM_BUCKETS = 10  # 0-9, 10-19, ... 90-100
+
+
+class Leaderboard:
+    """Best result per candidate for one CodeTest, kept in rank order.
+
+    Entries are ``(-score, submitted_at, user_id)`` tuples in a sorted list, so
+    top-N is a slice and a candidate's rank is one bisect. Aggregates are
+    adjusted as entries come and go, never recomputed from the table.
+    """
+
+    def __init__(self, test_id: int):
+        self.test_id = test_id
+        self.watermark = 0
+        self.synced_at = 0.0
+        self._keys: List[tuple] = []
+        self._best: Dict[int, tuple] = {}  # user_id -> (key, problems_solved)
+        self._names: Dict[int, tuple] = {}  # user_id -> (full_name, email)
+        self._total = 0
+        self._histogram = [0] * HISTOGRAM_BUCKETS
+        self._solved: Counter = Counter()
+        self._lock = threading.Lock()
+
+    # --- updates ---
+    def _account(self, score: int, solved: int, sign: int):
+        self._total += sign * score
+        self._histogram[min(max(score, 0) * HISTOGRAM_BUCKETS // 100, HISTOGRAM_BUCKETS - 1)] += sign
+        self._solved[solved] += sign
+        if not self._solved[solved]: del self._solved[solved]
+
+    def apply(self, user_id: int, score: int, problems_solved: int, submitted_at: Optional[datetime]):
+        score, solved = score or 0, problems_solved or 0
+        key = (-score, submitted_at.timestamp() if submitted_at else float("inf"), user_id)
+        old = self._best.get(user_id)
+        if old is not None:
+            if old[0] <= key: return
+            del self._keys[bisect.bisect_left(self._keys, old[0])]
+            self._account(-old[0][0], old[1], -1)
+        bisect.insort(self._keys, key)
+        self._best[user_id] = (key, solved)
+        self._account(score, solved, 1)
+
+    def sync(self, db: Session, force: bool = False):
+        """Apply TestResult rows inserted since the last sync."""
+        with self._lock:
+            if not force and time.monotonic() - self.synced_at < SYNC_INTERVAL: return
+            rows = db.query(models.TestResult.id, models.TestResult.user_id, models.TestResult.score, models.TestResult.problems_solved,
+                            models.TestResult.submitted_at, models.User.full_name, models.User.email) \
+                .join(models.User, models.User.id == models.TestResult.user_id) \
+                .filter(models.TestResult.test_id == self.test_id, models.TestResult.id > self.watermark - SYNC_OVERLAP) \
+                .order_by(models.TestResult.id).all()
+            for r in rows:
+                self._names[r.user_id] = (r.full_name, r.email)
+                self.apply(r.user_id, r.score, r.problems_solved, r.submitted_at)
+                self.watermark = max(self.watermark, r.id)
+            self.synced_at = time.monotonic()
+
+    # --- queries ---
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _entry(self, rank: int, key: tuple) -> Dict:
+        user_id = key[2]
+        name, email = self._names.get(user_id, (None, None))
+        return {"rank": rank, "user_id": user_id, "student_name": name, "email": email, "score": -key[0], "problems_solved": self._best[user_id][1],
+                "submitted_at": datetime.fromtimestamp(key[1]).strftime("%Y-%m-%d %H:%M") if key[1] != float("inf") else None}
+
+    def _rank_of(self, key: tuple) -> int:
+        # Equal scores share a rank ("1, 2, 2, 4").
+        return bisect.bisect_left(self._keys, (key[0],)) + 1
+
+    def top(self, n: int) -> List[Dict]:
+        with self._lock:
+            return [self._entry(self._rank_of(k), k) for k in self._keys[:n]]
+
+    def rank(self, user_id: int) -> Optional[Dict]:
+        with self._lock:
+            best = self._best.get(user_id)
+            if best is None: return None
+            return {**self._entry(self._rank_of(best[0]), best[0]), "out_of": len(self._keys)}
+
+    def _percentile(self, q: float) -> int:
+        # Nearest rank: the ceil(q * n)-th lowest score. _keys runs from highest to lowest.
+        n = len(self._keys)
+        return -self._keys[n - max(math.ceil(q * n), 1)][0]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            n = len(self._keys)
+            pct = lambda q: self._percentile(q) if n else None
+            width = 100 // HISTOGRAM_BUCKETS
+            return {
+                "test_id": self.test_id, "count": n,
+                "mean": round(self._total / n, 2) if n else None,
+                "median": pct(0.5), "p25": pct(0.25), "p75": pct(0.75), "p90": pct(0.9), "p99": pct(0.99),
+                "min": -self._keys[-1][0] if n else None, "max": -self._keys[0][0] if n else None,
+                "histogram": [{"range": f"{i * width}-{(i + 1) * width - 1 if i < HISTOGRAM_BUCKETS - 1 else 100}", "count": c} for i, c in enumerate(self._histogram)],
+                "solved_distribution": {str(k): self._solved[k] for k in sorted(self._solved)},
+            }
+
+
+_boards: Dict[int, Leaderboard] = {}
+_boards_lock = threading.Lock()
+
+
+def get_board(db: Session, test_id: int, force: bool = False) -> Leaderboard:
+    with _boards_lock:
+        board = _boards.get(test_id)
+        if board is None:
+            board = _boards[test_id] = Leaderboard(test_id)
+    board.sync(db, force=force)
+    return board
+
+
+def record_result(db: Session, test_id: int):
+    """Call after committing a TestResult. Boards nobody has asked for yet are built lazily."""
+    if test_id in _boards:
+        get_board(db, test_id, force=True)
+
+
+def rebuild(db: Session, test_id: int) -> Leaderboard:
+    board = Leaderboard(test_id)
+    board.sync(db, force=True)
+    with _boards_lock:
+        _boards[test_id] = board
+    return board
@@ -0,0 +1,113 @@
+"""Live monitoring of a code test, pushed to instructors over Server-Sent Events.
+
+The ingest flusher publishes every batch of newly inserted results, and the
+start endpoint publishes who started, on channel ``code-test:<id>`` (see
+pubsub.py). A stream subscribes first, then sends the results already stored
+(those after ``Last-Event-ID`` when an EventSource reconnects), then live
+events, so nothing falls in between. Result events carry the result id as their
+SSE id and the same fields as ``GET /results`` plus ``id``; clients should
+de-duplicate by id, since catch-up re-reads a small overlap.
+
+A stream that falls behind gets a ``lagged`` event and catches up from the
+table again, so slow consumers never hold back the publisher. Streams end after
+LIVE_STREAM_MAX_AGE and the browser reconnects, which spreads watchers across
+workers and lets a draining worker finish.
+"""
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+import exports
+import models
+import pubsub
+from database import SessionLocal
+
+HEARTBEAT_INTERVAL = 15  # seconds; keeps proxies from closing an idle stream
+RETRY_MS = 2000          # how soon EventSource reconnects
+CATCHUP_BATCH = 500
+# Rows can commit out of id order (several workers flushing on PostgreSQL), so
+# catch-up re-reads this many ids below the last one seen, like leaderboard.py.
+REPLAY_OVERLAP = 100
+LIVE_STREAM_MAX_AGE = int(os.getenv("LIVE_STREAM_MAX_AGE", "300"))  # seconds
+
+
+def channel(test_id: int) -> str: return f"code-test:{test_id}"
+
+
+def watched(test_id: int) -> bool:
+    return pubsub.get_broker().wanted(channel(test_id))
+
+
+def result_event(r) -> Dict:
+    return {"type": "result", "id": r.id, **dict(zip(exports.RESULT_COLUMNS, exports.result_row(r)))}
+
+
+def publish_results(db: Session, inserted: List[tuple]):
+    """Call with ``(id, test_id)`` of TestResult rows just committed."""
+    by_test = defaultdict(list)
+    for result_id, test_id in inserted: by_test[test_id].append(result_id)
+    for test_id, ids in by_test.items():
+        if not watched(test_id): continue
+        rows = exports.results_query(db, test_id).filter(models.TestResult.id.in_(ids)).all()
+        pubsub.get_broker().publish_many(channel(test_id), [(None, result_event(r)) for r in rows])
+
+
+def publish_start(test_id: int, user_id: int, student_name: str, email: str):
+    # Keyed per student, so a student re-entering the test coalesces in a slow stream's queue.
+    pubsub.get_broker().publish(channel(test_id), {"type": "start", "user_id": user_id, "student_name": student_name, "email": email,
+                                                   "started_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")}, key=f"start:{user_id}")
+
+
+def load_results(test_id: int, after: int, limit: int = CATCHUP_BATCH) -> List[Dict]:
+    with SessionLocal() as db:
+        return [result_event(r) for r in exports.results_query(db, test_id).filter(models.TestResult.id > after).limit(limit).all()]
+
+
+def sse(event: str, data: Dict, id: Optional[int] = None) -> bytes:
+    head = f"event: {event}\n" + (f"id: {id}\n" if id is not None else "")
+    return (head + "data: " + json.dumps(data, separators=(",", ":")) + "\n\n").encode("utf-8")
+
+
+async def stream(test_id: int, last_event_id: int = 0) -> AsyncIterator[bytes]:
+    sent = set()  # result ids, so catch-up and live delivery never repeat one
+    watermark = last_event_id  # highest result id sent
+
+    def send(event: Dict) -> Optional[bytes]:
+        nonlocal watermark
+        if event["id"] in sent: return None
+        sent.add(event["id"]); watermark = max(watermark, event["id"])
+        return sse("result", event, id=event["id"])
+
+    async def catch_up():
+        after = max(watermark - REPLAY_OVERLAP, 0)
+        while True:
+            rows = await run_in_threadpool(load_results, test_id, after)
+            for event in rows:
+                chunk = send(event)
+                if chunk: yield chunk
+            if len(rows) < CATCHUP_BATCH: return
+            after = rows[-1]["id"]
+
+    deadline = time.monotonic() + LIVE_STREAM_MAX_AGE
+    async with pubsub.get_broker().subscribe(channel(test_id)) as sub:
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        async for chunk in catch_up(): yield chunk
+        yield sse("ready", {"test_id": test_id})
+        while time.monotonic() < deadline:
+            events = await sub.get(timeout=min(HEARTBEAT_INTERVAL, max(deadline - time.monotonic(), 0)))
+            if not events: yield b": ping\n\n"; continue
+            for event in events:
+                if event["type"] == "result":
+                    chunk = send(event)
+                    if chunk: yield chunk
+                elif event["type"] == "lagged":
+                    yield sse("lagged", event)
+                    async for chunk in catch_up(): yield chunk
+                else:
+                    yield sse(event["type"], event)
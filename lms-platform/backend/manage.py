@@ -0,0 +1,45 @@
+"""Database management commands.
+
+    python manage.py init       # create the schema in a new database
+    python manage.py migrate    # apply pending migrations to an existing one
+    python manage.py status     # list pending migrations
+    python manage.py ingest-retry  # re-insert submissions in ingest/dead-letter.jsonl
+
+The app does not touch the schema on import; run one of these before starting
+it (or set AUTO_MIGRATE=1 during development). Uses DATABASE_URL like the app.
+"""
+import sys
+
+import ingest
+import migrations
+from database import SQL_DATABASE_URL, engine
+
+
+def init():
+    applied = migrations.upgrade(engine)
+    print(f"✅ Database ready at {SQL_DATABASE_URL} ({len(applied)} migration(s) applied).")
+
+
+def migrate():
+    applied = migrations.upgrade(engine)
+    print(f"✅ Applied {len(applied)} migration(s): {', '.join(applied)}" if applied else "✅ Database is up to date.")
+
+
+def status():
+    todo = migrations.pending(engine)
+    print(f"⚠️ Pending: {', '.join(todo)}" if todo else "✅ Database is up to date.")
+    return 1 if todo else 0
+
+
+def ingest_retry():
+    retried, failed = ingest.retry_dead_letters()
+    print(f"{'⚠️' if failed else '✅'} Retried {retried} submission(s), {failed} still failing.")
+    return 1 if failed else 0
+
+
+COMMANDS = {"init": init, "migrate": migrate, "status": status, "ingest-retry": ingest_retry}
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in COMMANDS:
+        sys.exit(__doc__)
+    sys.exit(COMMANDS[sys.argv[1]]())
@@ -0,0 +1,217 @@
+"""Lesson media hosted by the API: resumable chunked uploads and ranged serving.
+
+Uploading is a session, much like the GCS/tus resumable protocols:
+
+    POST /api/v1/media/uploads            {course_id, filename, content_type, size, sha256?}
+    PUT  /api/v1/media/uploads/{id}       Content-Range: bytes <start>-<end>/<size>
+    GET  /api/v1/media/uploads/{id}       how many bytes are stored, i.e. where to resume
+
+Chunks must arrive in order. Each one is streamed to ``<id>.part`` at its
+offset and fsynced before ``received`` advances, so a client that lost its
+connection asks for the status and resends from there. An optional
+``X-Chunk-SHA256`` header is checked per chunk. When the last byte arrives the
+file is hashed, compared against the ``sha256`` given at the start (if any)
+and renamed into place.
+
+Finished assets never change, so their metadata is cached and they are served
+with a strong ETag (the sha256), Range and If-Range support from Starlette's
+FileResponse, and 304s for conditional GETs. Set MEDIA_ACCEL_REDIRECT to the
+internal location nginx maps onto MEDIA_DIR to have nginx send the bytes with
+sendfile instead of a Python worker.
+"""
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Optional
+
+import anyio
+from starlette.requests import ClientDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+
+import models
+from cache import TTLCache
+from database import SessionLocal
+
+MEDIA_DIR = os.getenv("MEDIA_DIR", "./media")
+MEDIA_MAX_SIZE = int(os.getenv("MEDIA_MAX_SIZE", str(4 * 1024 ** 3)))  # bytes per asset
+MEDIA_CHUNK_SIZE = 8 * 1024 * 1024    # suggested to clients
+MEDIA_MAX_CHUNK = 64 * 1024 * 1024    # largest PUT accepted
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT", "")  # e.g. "/protected-media/"
+MEDIA_CACHE_CONTROL = "private, max-age=3600"
+HASH_BLOCK = 1024 * 1024
+# Served inline from the API's origin, so nothing a browser would run as a page.
+INLINE_TYPES = ("video/", "audio/", "image/png", "image/jpeg", "image/gif", "image/webp", "application/pdf")
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)$")
+_SHA256 = re.compile(r"[0-9a-f]{64}$")
+
+
+class UploadError(Exception):
+    def __init__(self, status_code: int, detail):
+        super().__init__(detail)
+        self.status_code, self.detail = status_code, detail
+
+
+@dataclass(frozen=True)
+class Asset:
+    """A finished upload; everything needed to serve it without the database."""
+    id: int
+    course_id: int
+    owner_id: int
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
+    completed_at: datetime
+
+    @property
+    def etag(self) -> str: return f'"{self.sha256}"'
+
+    @property
+    def mtime(self) -> float: return self.completed_at.replace(tzinfo=timezone.utc).timestamp()  # stored as naive UTC
+
+    @property
+    def last_modified(self) -> str: return formatdate(self.mtime, usegmt=True)
+
+
+asset_cache = TTLCache(maxsize=4096, ttl=3600)
+
+
+def part_path(asset_id: int) -> str: return os.path.join(MEDIA_DIR, "uploads", f"{asset_id}.part")
+def asset_path(asset_id: int) -> str: return os.path.join(MEDIA_DIR, f"{asset_id // 1000:04d}", str(asset_id))
+
+
+def validate_new_upload(size: int, sha256: Optional[str]):
+    if size <= 0: raise UploadError(400, "size must be positive")
+    if size > MEDIA_MAX_SIZE: raise UploadError(413, f"Files are limited to {MEDIA_MAX_SIZE} bytes")
+    if sha256 is not None and not _SHA256.match(sha256): raise UploadError(400, "sha256 must be 64 lowercase hex digits")
+
+
+def safe_content_type(content_type: Optional[str]) -> str:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    return content_type if content_type.startswith(INLINE_TYPES) else "application/octet-stream"
+
+
+def status_of(asset: models.MediaAsset) -> dict:
+    return {"id": asset.id, "status": asset.status, "size": asset.size, "received": asset.received, "sha256": asset.sha256,
+            "chunk_size": MEDIA_CHUNK_SIZE, "url": f"/api/v1/media/{asset.id}" if asset.status == "ready" else None}
+
+
+def create_part_file(asset_id: int):
+    os.makedirs(os.path.dirname(part_path(asset_id)), exist_ok=True)
+    open(part_path(asset_id), "wb").close()
+
+
+def parse_content_range(header: Optional[str], size: int):
+    """``Content-Range: bytes start-end/total`` -> ``(start, end_exclusive)``."""
+    m = _CONTENT_RANGE.match((header or "").strip())
+    if not m: raise UploadError(400, "Content-Range: bytes <start>-<end>/<size> is required")
+    start, end = int(m.group(1)), int(m.group(2)) + 1
+    if m.group(3) != "*" and int(m.group(3)) != size: raise UploadError(400, f"Upload size is {size}")
+    if start >= end or end > size: raise UploadError(416, "Range outside the upload")
+    if end - start > MEDIA_MAX_CHUNK: raise UploadError(413, f"Chunks are limited to {MEDIA_MAX_CHUNK} bytes")
+    return start, end
+
+
+async def write_chunk(asset_id: int, start: int, end: int, body: AsyncIterator[bytes], chunk_sha256: Optional[str] = None):
+    """Stream ``body`` into the part file at ``start``; returns once it is on disk."""
+    digest, written = hashlib.sha256(), start
+    async with await anyio.open_file(part_path(asset_id), "r+b") as f:
+        await f.seek(start)
+        try:
+            async for data in body:
+                if written + len(data) > end: raise UploadError(400, "Body is longer than its Content-Range")
+                await f.write(data); digest.update(data); written += len(data)
+        except ClientDisconnect: raise UploadError(400, "Upload interrupted")
+        if written != end: raise UploadError(400, "Body is shorter than its Content-Range")
+        await f.flush()
+        await anyio.to_thread.run_sync(os.fsync, f.wrapped.fileno())
+    if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower(): raise UploadError(422, "Chunk checksum mismatch")
+
+
+def advance(asset_id: int, start: int, end: int) -> bool:
+    """Record a stored chunk; False if another request already moved past ``start``."""
+    with SessionLocal() as db:
+        moved = db.query(models.MediaAsset).filter(models.MediaAsset.id == asset_id, models.MediaAsset.status == "uploading",
+                                                   models.MediaAsset.received == start).update({"received": end}, synchronize_session=False)
+        db.commit()
+    return moved == 1
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""): digest.update(block)
+    return digest.hexdigest()
+
+
+def finish(asset_id: int) -> str:
+    """Verify a fully received upload and move it into place; returns its sha256."""
+    with SessionLocal() as db:
+        asset = db.query(models.MediaAsset).filter(models.MediaAsset.id == asset_id).one()
+        path = part_path(asset_id)
+        os.truncate(path, asset.size)  # drop anything past the end from a rejected chunk
+        actual = file_sha256(path)
+        if asset.sha256 and actual != asset.sha256:
+            # Some chunk was corrupted without a per-chunk checksum to catch it; start over.
+            asset.received = 0; db.commit(); create_part_file(asset_id)
+            raise UploadError(422, "File checksum mismatch, upload restarted")
+        os.makedirs(os.path.dirname(asset_path(asset_id)), exist_ok=True)
+        os.replace(path, asset_path(asset_id))
+        asset.sha256, asset.status, asset.completed_at = actual, "ready", datetime.utcnow()
+        db.commit()
+    return actual
+
+
+def get_asset(db, asset_id: int) -> Optional[Asset]:
+    """A finished asset, or None while it is missing or still uploading."""
+    asset = asset_cache.get(asset_id)
+    if asset is None:
+        row = db.query(models.MediaAsset.id, models.MediaAsset.course_id, models.MediaAsset.owner_id, models.MediaAsset.filename,
+                       models.MediaAsset.content_type, models.MediaAsset.size, models.MediaAsset.sha256, models.MediaAsset.completed_at) \
+            .filter(models.MediaAsset.id == asset_id, models.MediaAsset.status == "ready").first()
+        if row is None: return None
+        asset = Asset(*row); asset_cache.set(asset_id, asset)
+    return asset
+
+
+def not_modified(asset: Asset, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or asset.etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    if if_modified_since:
+        try: return int(asset.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError): return False
+    return False
+
+
+def serve(asset: Asset, if_none_match: Optional[str] = None, if_modified_since: Optional[str] = None) -> Response:
+    headers = {"ETag": asset.etag, "Last-Modified": asset.last_modified, "Cache-Control": MEDIA_CACHE_CONTROL, "X-Content-Type-Options": "nosniff"}
+    if not_modified(asset, if_none_match, if_modified_since): return Response(status_code=304, headers=headers)
+    if MEDIA_ACCEL_REDIRECT:
+        # nginx serves the file (sendfile, ranges) from its internal location.
+        location = MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + os.path.relpath(asset_path(asset.id), MEDIA_DIR).replace(os.sep, "/")
+        return Response(media_type=asset.content_type, headers={**headers, "X-Accel-Redirect": location})
+    inline = asset.content_type != "application/octet-stream"
+    return FileResponse(asset_path(asset.id), media_type=asset.content_type, headers=headers, filename=asset.filename,
+                        content_disposition_type="inline" if inline else "attachment")
+
+
+_writing = set()  # uploads with a PUT in flight in this process
+
+
+async def receive_chunk(asset_id: int, size: int, received: int, content_range: Optional[str], body: AsyncIterator[bytes],
+                        chunk_sha256: Optional[str] = None) -> int:
+    """Store one PUT; returns the new ``received`` count."""
+    start, end = parse_content_range(content_range, size)
+    if start != received or asset_id in _writing: raise UploadError(409, {"message": "Resume from the stored offset", "received": received})
+    _writing.add(asset_id)
+    try:
+        await write_chunk(asset_id, start, end, body, chunk_sha256)
+        if not await run_in_threadpool(advance, asset_id, start, end): raise UploadError(409, "Another request stored this chunk")
+    finally:
+        _writing.discard(asset_id)
+    return end
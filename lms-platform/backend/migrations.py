@@ -0,0 +1,134 @@
+"""Create and upgrade the database schema.
+
+    python manage.py migrate      (or: python migrations.py)
+
+New tables come from the models via ``create_all``; anything that has to change
+an existing database goes in ``MIGRATIONS``. Each migration runs once, in its
+own transaction, and is recorded in the ``schema_migrations`` table. Migrations
+spell out their DDL rather than reading models.py, so what an applied
+migration did never changes when the models do.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+import models
+from database import engine as default_engine
+
+logger = logging.getLogger("lms.migrations")
+
+
+def _create_indexes(conn, table, indexes):
+    for name, columns, unique in indexes:
+        cols = ", ".join(f'"{c}"' for c in columns)
+        conn.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({cols})"))
+
+
+def m0001_hot_path_indexes(conn):
+    # The unique (user_id, course_id) index would fail on duplicate enrollments.
+    conn.execute(text("DELETE FROM enrollments WHERE id NOT IN (SELECT MIN(id) FROM enrollments GROUP BY user_id, course_id)"))
+    _create_indexes(conn, "courses", [("ix_courses_is_published", ["is_published"], False), ("ix_courses_instructor_id", ["instructor_id"], False)])
+    _create_indexes(conn, "modules", [("ix_modules_course_id_order", ["course_id", "order"], False)])
+    _create_indexes(conn, "content_items", [("ix_content_items_module_id_order", ["module_id", "order"], False)])
+    _create_indexes(conn, "enrollments", [("uq_enrollments_user_id_course_id", ["user_id", "course_id"], True),
+                                          ("ix_enrollments_course_id", ["course_id"], False)])
+    _create_indexes(conn, "submissions", [("ix_submissions_user_id", ["user_id"], False), ("ix_submissions_content_item_id", ["content_item_id"], False)])
+    _create_indexes(conn, "code_tests", [("ix_code_tests_instructor_id", ["instructor_id"], False)])
+    _create_indexes(conn, "problems", [("ix_problems_test_id", ["test_id"], False)])
+    _create_indexes(conn, "test_results", [("ix_test_results_test_id_user_id", ["test_id", "user_id"], False),
+                                           ("ix_test_results_user_id", ["user_id"], False)])
+
+
+def m0002_course_search(conn):
+    # Full-text index over course title and description, see catalog.py.
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(title, description, content='courses', content_rowid='id')"))
+        conn.execute(text("INSERT INTO courses_fts(courses_fts) VALUES ('rebuild')"))
+        # External-content FTS tables are kept in step with triggers, so every
+        # write (create_course, publish, bulk seeding) updates the index.
+        conn.execute(text("""CREATE TRIGGER IF NOT EXISTS courses_fts_insert AFTER INSERT ON courses BEGIN
+            INSERT INTO courses_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"""))
+        conn.execute(text("""CREATE TRIGGER IF NOT EXISTS courses_fts_delete AFTER DELETE ON courses BEGIN
+            INSERT INTO courses_fts(courses_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END"""))
+        conn.execute(text("""CREATE TRIGGER IF NOT EXISTS courses_fts_update AFTER UPDATE OF title, description ON courses BEGIN
+            INSERT INTO courses_fts(courses_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO courses_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"""))
+    elif conn.dialect.name == "postgresql":
+        from catalog import PG_SEARCH_VECTOR
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_courses_search ON courses USING GIN ({PG_SEARCH_VECTOR})"))
+
+
+def m0003_unique_test_results(conn):
+    # One result per (test, user) from now on, and the first submission is the
+    # one that counts (see ingest.py). Later duplicates are moved, not deleted,
+    # to test_results_archive so nothing is lost.
+    later = "id NOT IN (SELECT MIN(id) FROM test_results GROUP BY test_id, user_id)"
+    conn.execute(text("CREATE TABLE IF NOT EXISTS test_results_archive AS SELECT * FROM test_results WHERE 1 = 0"))
+    moved = conn.execute(text(f"INSERT INTO test_results_archive SELECT * FROM test_results WHERE {later}")).rowcount
+    if moved: logger.warning("Moved %d duplicate result(s) to test_results_archive, keeping each student's first", moved)
+    conn.execute(text(f"DELETE FROM test_results WHERE {later}"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_test_results_test_id_user_id"))
+    _create_indexes(conn, "test_results", [("uq_test_results_test_id_user_id", ["test_id", "user_id"], True)])
+
+
+def m0004_media_assets(conn):
+    # Lesson media uploaded through the API, see media.py.
+    serial = "SERIAL" if conn.dialect.name == "postgresql" else "INTEGER"
+    conn.execute(text(f"""CREATE TABLE IF NOT EXISTS media_assets (
+        id {serial} NOT NULL PRIMARY KEY,
+        course_id INTEGER REFERENCES courses (id),
+        owner_id INTEGER REFERENCES users (id),
+        filename VARCHAR,
+        content_type VARCHAR,
+        size BIGINT,
+        received BIGINT,
+        sha256 VARCHAR(64),
+        status VARCHAR,
+        created_at TIMESTAMP,
+        completed_at TIMESTAMP)"""))
+    _create_indexes(conn, "media_assets", [("ix_media_assets_id", ["id"], False), ("ix_media_assets_course_id", ["course_id"], False),
+                                           ("ix_media_assets_status", ["status"], False)])
+
+
+def m0005_users_email_lower(conn):
+    # Bulk admit matches existing accounts on lower(email); the plain email
+    # index can't serve that, so every upload scanned the users table.
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email))"))
+
+
+MIGRATIONS = [
+    ("0001_hot_path_indexes", m0001_hot_path_indexes),
+    ("0002_course_search", m0002_course_search),
+    ("0003_unique_test_results", m0003_unique_test_results),
+    ("0004_media_assets", m0004_media_assets),
+    ("0005_users_email_lower", m0005_users_email_lower),
+]
+
+
+def pending(engine=default_engine):
+    """Names of migrations not yet applied; every one of them if the schema was never created."""
+    if not inspect(engine).has_table("schema_migrations"): return [name for name, _ in MIGRATIONS]
+    with engine.connect() as conn:
+        applied = {name for (name,) in conn.execute(text("SELECT name FROM schema_migrations"))}
+    return [name for name, _ in MIGRATIONS if name not in applied]
+
+
+def upgrade(engine=default_engine):
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_migrations (name VARCHAR(255) PRIMARY KEY, applied_at TIMESTAMP)"))
+        applied = {name for (name,) in conn.execute(text("SELECT name FROM schema_migrations"))}
+    done = []
+    for name, migrate in MIGRATIONS:
+        if name in applied: continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(text("INSERT INTO schema_migrations (name, applied_at) VALUES (:name, :at)"), {"name": name, "at": datetime.utcnow()})
+        done.append(name)
+    return done
+
+
+if __name__ == "__main__":
+    applied = upgrade()
+    print(f"✅ Applied {len(applied)} migration(s): {', '.join(applied)}" if applied else "✅ Database is up to date.")
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text, JSON
+from sqlalchemy import BigInteger, Boolean, Column, ForeignKey, Integer, String, DateTime, Text, JSON, Index, func
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -10,6 +10,7 @@ class User(Base):
     full_name = Column(String)
     hashed_password = Column(String)
     role = Column(String) 
+    __table_args__ = (Index("ix_users_email_lower", func.lower(email)),)  # case-insensitive lookups, see bulk_admit.py
     
     enrollments = relationship("Enrollment", back_populates="student")
     submissions = relationship("Submission", back_populates="student")
@@ -22,14 +23,15 @@ class Course(Base):
     description = Column(String)
     price = Column(Integer)
     image_url = Column(String, nullable=True)
-    is_published = Column(Boolean, default=False)
-    instructor_id = Column(Integer, ForeignKey("users.id"))
+    is_published = Column(Boolean, default=False, index=True)
+    instructor_id = Column(Integer, ForeignKey("users.id"), index=True)
     
     modules = relationship("Module", back_populates="course")
     enrollments = relationship("Enrollment", back_populates="course")
 
 class Module(Base):
     __tablename__ = "modules"
+    __table_args__ = (Index("ix_modules_course_id_order", "course_id", "order"),)
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     order = Column(Integer)
@@ -40,6 +42,7 @@ class Module(Base):
 
 class ContentItem(Base):
     __tablename__ = "content_items"
+    __table_args__ = (Index("ix_content_items_module_id_order", "module_id", "order"),)
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     type = Column(String) 
@@ -56,9 +59,10 @@ class ContentItem(Base):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (Index("uq_enrollments_user_id_course_id", "user_id", "course_id", unique=True),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    course_id = Column(Integer, ForeignKey("courses.id"))
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
     enrolled_at = Column(DateTime, default=datetime.utcnow)
     
     enrollment_type = Column(String, default="paid") 
@@ -70,8 +74,8 @@ class Enrollment(Base):
 class Submission(Base):
     __tablename__ = "submissions"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    content_item_id = Column(Integer, ForeignKey("content_items.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    content_item_id = Column(Integer, ForeignKey("content_items.id"), index=True)
     drive_link = Column(String)
     status = Column(String, default="Pending")
     submitted_at = Column(DateTime, default=datetime.utcnow)
@@ -86,7 +90,7 @@ class CodeTest(Base):
     title = Column(String)
     pass_key = Column(String)
     time_limit = Column(Integer) # In minutes
-    instructor_id = Column(Integer, ForeignKey("users.id"))
+    instructor_id = Column(Integer, ForeignKey("users.id"), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     problems = relationship("Problem", back_populates="test")
@@ -95,7 +99,7 @@ class CodeTest(Base):
 class Problem(Base):
     __tablename__ = "problems"
     id = Column(Integer, primary_key=True, index=True)
-    test_id = Column(Integer, ForeignKey("code_tests.id"))
+    test_id = Column(Integer, ForeignKey("code_tests.id"), index=True)
     title = Column(String)
     description = Column(Text)
     difficulty = Column(String)
@@ -105,13 +109,28 @@ class Problem(Base):
 
 class TestResult(Base):
     __tablename__ = "test_results"
+    __table_args__ = (Index("uq_test_results_test_id_user_id", "test_id", "user_id", unique=True),)  # one result per candidate, see ingest.py
     id = Column(Integer, primary_key=True, index=True)
     test_id = Column(Integer, ForeignKey("code_tests.id"))
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     score = Column(Integer)
     problems_solved = Column(Integer)
     time_taken = Column(String) # "45 mins"
     submitted_at = Column(DateTime, default=datetime.utcnow)
     
     student = relationship("User", back_populates="test_results")
-    test = relationship("CodeTest", back_populates="results")
\ No newline at end of file
+    test = relationship("CodeTest", back_populates="results")
+
+class MediaAsset(Base):
+    __tablename__ = "media_assets"
+    id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    filename = Column(String)
+    content_type = Column(String)
+    size = Column(BigInteger)                   # declared when the upload starts
+    received = Column(BigInteger, default=0)    # bytes on disk so far, see media.py
+    sha256 = Column(String(64), nullable=True)  # expected digest, then the verified one
+    status = Column(String, default="uploading", index=True)  # uploading | ready
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""Publish/subscribe for pushing events to connected clients.
+
+Publishers call ``publish`` from any thread (the ingest flusher, a request
+handler) and never block on subscribers: each subscriber has a bounded queue
+that is filled on its own event loop. Events published with a ``key`` replace
+a queued event with the same key, so bursts coalesce. A subscriber that still
+falls more than PUBSUB_QUEUE_SIZE events behind has its backlog dropped and
+gets one ``{"type": "lagged"}`` event instead, telling it to catch up from
+the source of truth.
+
+LocalBroker only reaches subscribers in this process; it is the default and
+what benchmarks use. With several workers set PUBSUB_URL=redis://... so an
+event published on one worker reaches subscribers on all of them (needs the
+``redis`` package).
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+PUBSUB_URL = os.getenv("PUBSUB_URL", "")
+PUBSUB_QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", "1000"))  # queued events per subscriber
+REDIS_PREFIX = "lms:"
+REDIS_RETRY_DELAY = 1.0
+
+logger = logging.getLogger("lms.pubsub")
+Event = Tuple[Optional[str], dict]  # (coalescing key, payload)
+_LAGGED = object()
+
+
+class Subscription:
+    def __init__(self, channel: str, maxsize: int):
+        self.channel, self.maxsize = channel, maxsize
+        self._loop = asyncio.get_running_loop()
+        self._pending: "OrderedDict[object, dict]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._seq = 0
+
+    def deliver(self, events: List[Event]):
+        """Thread-safe; hands ``events`` to the subscriber's loop."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop: self._enqueue(events); return
+        try: self._loop.call_soon_threadsafe(self._enqueue, events)
+        except RuntimeError: pass  # loop closed, the subscriber is gone
+
+    def _enqueue(self, events: List[Event]):
+        for key, event in events:
+            if key is None: self._seq += 1; key = self._seq
+            else: self._pending.pop(key, None)  # newest wins and moves to the back
+            self._pending[key] = event
+        if len(self._pending) > self.maxsize:
+            dropped = self._pending.pop(_LAGGED, {"dropped": 0})["dropped"] + len(self._pending)
+            self._pending.clear()
+            self._pending[_LAGGED] = {"type": "lagged", "dropped": dropped}
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> List[dict]:
+        """Everything queued, oldest first; waits for at least one event, or returns [] after ``timeout``."""
+        if not self._pending:
+            self._ready.clear()
+            try: await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError: return []
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+
+class Broker:
+    """Interface; ``publish_many`` must be thread-safe and must not wait on subscribers."""
+
+    def publish(self, channel: str, event: dict, key: Optional[str] = None):
+        self.publish_many(channel, [(key, event)])
+
+    def publish_many(self, channel: str, events: List[Event]):
+        raise NotImplementedError
+
+    def wanted(self, channel: str) -> bool:
+        """False only if nobody can be listening, so publishers may skip building events."""
+        return True
+
+    def subscribe(self, channel: str) -> "AsyncIterator[Subscription]":
+        """``async with broker.subscribe(channel) as sub``; events published after entry are delivered."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LocalBroker(Broker):
+    def __init__(self, queue_size: int = PUBSUB_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def publish_many(self, channel: str, events: List[Event]):
+        if not events: return
+        with self._lock:
+            subs = list(self._subs.get(channel, ()))
+        for sub in subs: sub.deliver(events)
+
+    def wanted(self, channel: str) -> bool:
+        return bool(self._subs.get(channel))
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        sub = Subscription(channel, self.queue_size)
+        with self._lock:
+            self._subs.setdefault(channel, set()).add(sub)
+        try:
+            yield sub
+        finally:
+            with self._lock:
+                subs = self._subs[channel]
+                subs.discard(sub)
+                if not subs: del self._subs[channel]
+
+
+@dataclass
+class _Reader:
+    task: asyncio.Task
+    ready: asyncio.Event
+    users: int = 0
+
+
+class RedisBroker(Broker):
+    """Publishes through Redis; each worker runs one Redis subscription per
+    channel it has local subscribers for and fans events out via a LocalBroker."""
+
+    def __init__(self, url: str, queue_size: int = PUBSUB_QUEUE_SIZE):
+        import redis
+        self.url = url
+        self._client = redis.Redis.from_url(url)  # blocking client; publishers run in threads
+        self._local = LocalBroker(queue_size)
+        self._readers: Dict[str, _Reader] = {}
+
+    def publish_many(self, channel: str, events: List[Event]):
+        if events: self._client.publish(REDIS_PREFIX + channel, json.dumps(events, separators=(",", ":"), default=str))
+
+    async def _read(self, channel: str, ready: asyncio.Event):
+        import redis.asyncio
+        while True:
+            client = redis.asyncio.Redis.from_url(self.url)
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(REDIS_PREFIX + channel)
+                ready.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._local.publish_many(channel, [tuple(e) for e in json.loads(message["data"])])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Events published while disconnected are lost; subscribers catch up on the next lag or reconnect.
+                logger.exception("Redis subscription to %s failed, reconnecting", channel)
+                await asyncio.sleep(REDIS_RETRY_DELAY)
+            finally:
+                await client.aclose()
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        async with self._local.subscribe(channel) as sub:
+            reader = self._readers.get(channel)
+            if reader is None:
+                ready = asyncio.Event()
+                reader = self._readers[channel] = _Reader(asyncio.create_task(self._read(channel, ready)), ready)
+            reader.users += 1
+            try:
+                try: await asyncio.wait_for(reader.ready.wait(), 5)
+                except asyncio.TimeoutError: logger.warning("Redis subscription to %s is not ready yet", channel)
+                yield sub
+            finally:
+                reader.users -= 1
+                if not reader.users: self._readers.pop(channel).task.cancel()
+
+    def close(self):
+        for reader in self._readers.values(): reader.task.cancel()
+        self._client.close()
+
+
+_broker: Optional[Broker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> Broker:
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = RedisBroker(PUBSUB_URL) if PUBSUB_URL else LocalBroker()
+        return _broker
+
+
+def shutdown():
+    global _broker
+    with _broker_lock:
+        if _broker is not None:
+            _broker.close()
+            _broker = None
@@ -0,0 +1,126 @@
+"""Fill a database with a synthetic, production-sized dataset.
+
+    python seed_data.py                                   # ./lms.db (or DATABASE_URL)
+    python seed_data.py --students 50000 --courses 200 --seed 7
+
+Rows are written straight to the tables with bulk inserts, and the same seed
+always produces the same data. Every account's password is ``SEED_PASSWORD``;
+instructors are instructor<N>@seed.local and students student<N>@seed.local.
+Run it against an empty database: ids are assigned in insert order.
+"""
+import argparse
+import json
+import random
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+
+from passlib.hash import bcrypt
+from sqlalchemy import func
+
+import migrations
+import models
+from database import SessionLocal, engine
+
+SEED_PASSWORD = "password123"
+INSERT_CHUNK = 5000
+EPOCH = datetime(2024, 1, 1)  # fixed, so timestamps don't depend on when the seed ran
+CONTENT_TYPES = ["video", "video", "video", "note", "quiz", "assignment", "code_test"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+
+
+@dataclass
+class Scale:
+    instructors: int = 20
+    students: int = 5000
+    courses: int = 100
+    modules_per_course: int = 8
+    items_per_module: int = 6
+    enrollments_per_student: int = 4
+    code_tests: int = 20
+    problems_per_test: int = 4
+    results_per_test: int = 1000
+
+
+def _insert(db, model, rows):
+    # Returns the id of the first inserted row; the rest follow in order.
+    first = (db.query(func.max(model.id)).scalar() or 0) + 1
+    for i in range(0, len(rows), INSERT_CHUNK):
+        db.execute(model.__table__.insert(), rows[i:i + INSERT_CHUNK])
+    return first
+
+
+def generate(scale: Scale = Scale(), seed: int = 42, bind=engine) -> dict:
+    rng = random.Random(seed)
+    migrations.upgrade(bind)
+    db = SessionLocal(bind=bind)
+    try:
+        if db.query(models.User.id).first() is not None:
+            raise SystemExit("❌ Database already has users. Point DATABASE_URL at an empty database.")
+        hashed = bcrypt.hash(SEED_PASSWORD)
+
+        users = [{"email": f"instructor{i}@seed.local", "full_name": f"Instructor {i}", "hashed_password": hashed, "role": "instructor"} for i in range(1, scale.instructors + 1)]
+        users += [{"email": f"student{i}@seed.local", "full_name": f"Student {i}", "hashed_password": hashed, "role": "student"} for i in range(1, scale.students + 1)]
+        first_user = _insert(db, models.User, users)
+        instructor_ids = list(range(first_user, first_user + scale.instructors))
+        student_ids = list(range(first_user + scale.instructors, first_user + len(users)))
+
+        courses = [{"title": f"Course {i}", "description": f"Synthetic course {i}", "price": rng.choice([0, 499, 999, 1999]),
+                    "is_published": rng.random() < 0.8, "instructor_id": rng.choice(instructor_ids)} for i in range(1, scale.courses + 1)]
+        first_course = _insert(db, models.Course, courses)
+        course_ids = list(range(first_course, first_course + len(courses)))
+        published = [cid for cid, c in zip(course_ids, courses) if c["is_published"]] or course_ids
+
+        modules = [{"title": f"Module {m + 1}", "order": m, "course_id": cid} for cid in course_ids for m in range(scale.modules_per_course)]
+        first_module = _insert(db, models.Module, modules)
+        items = []
+        for module_id in range(first_module, first_module + len(modules)):
+            for k in range(scale.items_per_module):
+                kind = rng.choice(CONTENT_TYPES)
+                items.append({"title": f"Lesson {k + 1}", "type": kind, "content": f"https://example.com/{kind}/{module_id}/{k}", "order": k, "module_id": module_id,
+                              "duration": rng.randint(1, 60) if kind == "video" else None, "is_mandatory": rng.random() < 0.3,
+                              "instructions": None, "test_config": None})
+        _insert(db, models.ContentItem, items)
+
+        enrollments = []
+        for uid in student_ids:
+            for cid in rng.sample(published, min(scale.enrollments_per_student, len(published))):
+                trial = rng.random() < 0.2
+                enrolled_at = EPOCH + timedelta(minutes=rng.randint(0, 60 * 24 * 180))
+                enrollments.append({"user_id": uid, "course_id": cid, "enrolled_at": enrolled_at, "enrollment_type": "trial" if trial else "paid",
+                                    "expiry_date": enrolled_at + timedelta(days=7) if trial else None})
+        _insert(db, models.Enrollment, enrollments)
+
+        tests = [{"title": f"Code Test {i}", "pass_key": f"key{i}", "time_limit": rng.choice([30, 60, 90]), "instructor_id": rng.choice(instructor_ids),
+                  "created_at": EPOCH + timedelta(days=i)} for i in range(1, scale.code_tests + 1)]
+        first_test = _insert(db, models.CodeTest, tests)
+        test_ids = list(range(first_test, first_test + len(tests)))
+        problems = []
+        for tid in test_ids:
+            for p in range(scale.problems_per_test):
+                cases = [{"input": f"{a} {a + 1}", "output": str(2 * a + 1)} for a in rng.sample(range(1000), 3)]
+                problems.append({"test_id": tid, "title": f"Problem {p + 1}", "description": "Print the sum of two integers.",
+                                 "difficulty": rng.choice(DIFFICULTIES), "test_cases": json.dumps(cases)})
+        _insert(db, models.Problem, problems)
+
+        results = []
+        for tid in test_ids:
+            for uid in rng.sample(student_ids, min(scale.results_per_test, len(student_ids))):
+                solved = rng.randint(0, scale.problems_per_test)
+                results.append({"test_id": tid, "user_id": uid, "score": solved * 100 // max(scale.problems_per_test, 1), "problems_solved": solved,
+                                "time_taken": f"{rng.randint(5, 90)} mins", "submitted_at": EPOCH + timedelta(minutes=rng.randint(0, 60 * 24 * 180))})
+        _insert(db, models.TestResult, results)
+        db.commit()
+        return {"users": len(users), "courses": len(courses), "modules": len(modules), "content_items": len(items), "enrollments": len(enrollments),
+                "code_tests": len(tests), "problems": len(problems), "test_results": len(results)}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for f in fields(Scale):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=int, default=f.default)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    counts = generate(Scale(**{f.name: getattr(args, f.name) for f in fields(Scale)}), seed=args.seed)
+    print("✅ Seeded " + ", ".join(f"{n} {table}" for table, n in counts.items()))
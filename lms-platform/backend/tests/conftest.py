@@ -0,0 +1,40 @@
+"""Shared fixtures. Tests run against a throwaway SQLite database in a temp
+directory, like the benchmarks, and drive the app in-process.
+
+    cd lms-platform/backend && python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="lms_test_"))  # before database.py opens ./lms.db
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    import migrations
+    from fastapi.testclient import TestClient
+    migrations.upgrade()
+    with TestClient(main.app) as c:
+        yield c
+
+
+def _login(client, email: str, role: str) -> dict:
+    client.post("/api/v1/users", json={"email": email, "password": "pw", "name": email.split("@")[0].title(), "role": role})
+    token = client.post("/api/v1/login", data={"username": email, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="session")
+def instructor(client):
+    return _login(client, "instructor@test.local", "instructor")
+
+
+@pytest.fixture(scope="session")
+def student(client):
+    return _login(client, "student@test.local", "student")
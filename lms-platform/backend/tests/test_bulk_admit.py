@@ -0,0 +1,52 @@
+import pytest
+
+import bulk_admit
+import models
+from database import SessionLocal
+
+
+@pytest.fixture
+def course(client, instructor):
+    with SessionLocal() as db:
+        owner = db.query(models.User).filter(models.User.email == "instructor@test.local").one()
+        c = models.Course(title="Admit", description="d", price=0, is_published=True, instructor_id=owner.id)
+        db.add(c); db.commit()
+        return c.id
+
+
+def upload(client, instructor, course, text):
+    return client.post("/api/v1/admin/bulk-admit", headers=instructor, data={"course_id": str(course)},
+                       files={"file": ("students.csv", text.encode(), "text/csv")})
+
+
+def enrolled(course) -> set:
+    with SessionLocal() as db:
+        return {e for (e,) in db.query(models.User.email).join(models.Enrollment).filter(models.Enrollment.course_id == course)}
+
+
+def test_admits_new_and_existing_students(client, instructor, student, course):
+    r = upload(client, instructor, course, "email,name\nSTUDENT@test.local,S\nnew1@test.local,New\nnew1@test.local,Again\nnot-an-email,X\n")
+    assert r.status_code == 200
+    assert r.json()["summary"] == {"created": 1, "enrolled": 1, "already_enrolled": 0, "skipped": 2}
+    assert enrolled(course) == {"student@test.local", "new1@test.local"}
+
+
+def test_unreadable_file_admits_nobody(client, instructor, course, monkeypatch):
+    monkeypatch.setattr(bulk_admit, "CHUNK_SIZE", 2)
+    r = upload(client, instructor, course, "email,name\nok1@test.local,A\nok2@test.local,B\nok3@test.local,C\nok4@test.local,D,e,f\n")
+    assert r.status_code == 400 and r.json()["detail"].startswith("Invalid file")
+    assert enrolled(course) == set()
+
+
+def test_server_error_is_not_blamed_on_the_file(client, instructor, course, monkeypatch):
+    monkeypatch.setattr(bulk_admit, "CHUNK_SIZE", 1)
+    real, calls = bulk_admit._normalise, []
+
+    def failing(chunk, offset):
+        calls.append(offset)
+        if len(calls) == 2: raise RuntimeError("database went away")
+        return real(chunk, offset)
+    monkeypatch.setattr(bulk_admit, "_normalise", failing)
+    with pytest.raises(RuntimeError):  # the TestClient re-raises what would be a 500
+        upload(client, instructor, course, "email\nfirst@test.local\nsecond@test.local\n")
+    assert enrolled(course) == set()
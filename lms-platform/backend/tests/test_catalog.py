@@ -0,0 +1,36 @@
+import models
+from database import SessionLocal
+
+
+def seed_courses(n: int, title: str) -> set:
+    with SessionLocal() as db:
+        instructor = models.User(email=f"{title}@test.local", full_name=title, role="instructor")
+        db.add(instructor); db.flush()
+        courses = [models.Course(title=f"{title} {i}", description="d", price=0, is_published=True, instructor_id=instructor.id) for i in range(n)]
+        db.add_all(courses); db.commit()
+        return {c.id for c in courses}
+
+
+def test_courses_without_limit_returns_whole_catalog(client, student):
+    ids = seed_courses(600, "Catalog")
+    r = client.get("/api/v1/courses", headers=student)
+    assert r.status_code == 200 and "x-next-cursor" not in r.headers
+    assert ids <= {c["id"] for c in r.json()}
+
+
+def test_courses_pages_when_limit_given(client, student):
+    seed_courses(30, "Paged")
+    seen, after = [], None
+    while True:
+        r = client.get("/api/v1/courses", params={"limit": 10, **({"after": after} if after else {})}, headers=student)
+        page = r.json(); seen += [c["id"] for c in page]
+        assert len(page) <= 10
+        after = r.headers.get("x-next-cursor")
+        if not after: break
+    assert seen == sorted(seen) and set(seen) == {c["id"] for c in client.get("/api/v1/courses", headers=student).json()}
+
+
+def test_search_without_terms_is_no_search(client, student):
+    everything = client.get("/api/v1/courses", headers=student).json()
+    for q in ["", "  ", "!?"]:
+        assert client.get("/api/v1/courses", params={"q": q}, headers=student).json() == everything
@@ -0,0 +1,52 @@
+import io
+import os
+import re
+import zipfile
+import zlib
+
+import pytest
+
+import certificates
+from conftest import BACKEND_DIR
+
+
+@pytest.fixture
+def fresh_pool():
+    certificates.shutdown()
+    yield
+    certificates.shutdown()
+
+
+@pytest.fixture
+def with_logo(monkeypatch):
+    monkeypatch.chdir(BACKEND_DIR)  # logo.png lives next to the code
+    cached = (certificates._logo, certificates._logo_xobject)
+    for fn in cached: fn.cache_clear()
+    yield
+    for fn in cached: fn.cache_clear()
+
+
+def test_pool_starts_and_renders_zip(fresh_pool):
+    students = [(1000 + i, f"Student {i}") for i in range(20)]
+    data = b"".join(certificates.stream_course_zip(99, "Pool Course", students))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert len(zf.namelist()) == 20
+        assert all(zf.read(name).startswith(b"%PDF") for name in zf.namelist())
+    method = certificates._pool._mp_context.get_start_method()
+    assert method == ("forkserver" if os.name == "posix" else "spawn")
+
+
+def test_pool_falls_back_to_spawn_without_forkserver(fresh_pool, monkeypatch):
+    monkeypatch.setattr(certificates.multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    assert certificates._get_pool()._mp_context.get_start_method() == "spawn"
+
+
+def test_shared_logo_matches_draw_image(with_logo, monkeypatch):
+    def streams(pdf):
+        # Page content inflated, with the image's generated name blanked out; the logo's JPEG data as is.
+        found = [m.group(1) for m in re.finditer(rb"stream\r?\n(.*?)endstream", pdf, re.S)]
+        return [re.sub(rb"FormXob\.\w+", b"logo", zlib.decompress(s)) if s.startswith(b"x") else s for s in found]
+    assert certificates._logo_xobject() is not None
+    shared = certificates.render_certificate("Jane Student", "Course")
+    monkeypatch.setattr(certificates, "_logo_xobject", lambda: None)
+    assert streams(shared) == streams(certificates.render_certificate("Jane Student", "Course"))
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import execution
+
+
+def judge0(poll):
+    """A Judge0Backend whose HTTP calls go to ``poll(request)`` for GETs; batch POSTs hand out tokens."""
+    backend = execution.Judge0Backend(url="http://judge0.test", api_key="", poll_timeout=1)
+
+    def handler(request: httpx.Request):
+        if request.method == "POST":
+            return httpx.Response(201, json=[{"token": f"t{i}"} for i, _ in enumerate(json.loads(request.content)["submissions"])])
+        return poll(request)
+
+    async def bind():
+        backend._bind()
+        backend._client = httpx.AsyncClient(base_url=backend.url, transport=httpx.MockTransport(handler))
+    return backend, bind
+
+
+def done(tokens):
+    return {"submissions": [{"token": t, "stdout": "ok\n", "status": {"id": 3, "description": "Accepted"}} for t in tokens]}
+
+
+@pytest.mark.parametrize("bad", [
+    lambda r: httpx.Response(200, text="<html>502</html>"),
+    lambda r: httpx.Response(200, json={"error": "no submissions key"}),
+    lambda r: httpx.Response(200, json={"submissions": [{"stdout": "no token", "status": {"id": 3}}]}),
+])
+def test_poller_survives_malformed_response(bad):
+    calls = []
+
+    def poll(request):
+        calls.append(request)
+        if len(calls) == 1: return bad(request)
+        return httpx.Response(200, json=done(request.url.params["tokens"].split(",")))
+
+    backend, bind = judge0(poll)
+
+    async def scenario():
+        await bind()
+        with pytest.raises(execution.ExecutionError):
+            await asyncio.wait_for(backend.run(execution.Job("print('ok')")), 5)
+        # The poller is still serving later runs.
+        result = await asyncio.wait_for(backend.run(execution.Job("print('ok')")), 5)
+        await backend.aclose()
+        return result
+
+    assert asyncio.run(scenario())["stdout"] == "ok\n"
+
+
+def test_poll_deadline_applies_without_answers():
+    backend, bind = judge0(lambda r: httpx.Response(200, json={"submissions": []}))
+
+    async def scenario():
+        await bind()
+        with pytest.raises(execution.ExecutionError, match="Timed out"):
+            await asyncio.wait_for(backend.run(execution.Job("print(1)")), 5)
+        await backend.aclose()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("body", [{"not": "a list"}, [], ["token-as-string"]])
+def test_malformed_batch_response_is_execution_error(body):
+    backend = execution.Judge0Backend(url="http://judge0.test", api_key="")
+
+    async def scenario():
+        backend._bind()
+        backend._client = httpx.AsyncClient(base_url=backend.url, transport=httpx.MockTransport(lambda r: httpx.Response(201, json=body)))
+        with pytest.raises(execution.ExecutionError):
+            await backend.run(execution.Job("print(1)"))
+        await backend.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,33 @@
+import asyncio
+
+import execution
+import grading
+
+
+class EchoBackend:
+    """Accepts every job and prints its stdin back."""
+    async def run_batch(self, jobs):
+        return [{"status": execution.ACCEPTED, "stdout": job.stdin, "time": "0.01"} for job in jobs]
+
+
+def test_problem_without_cases_is_left_out_of_the_score(monkeypatch):
+    monkeypatch.setattr(execution, "get_backend", EchoBackend)
+    problems = {1: [{"input": "a", "output": "a"}, {"input": "b", "output": "x"}], 2: []}
+    solutions = {pid: execution.Job("print(input())") for pid in problems}
+    report = asyncio.run(grading.grade(problems, solutions))
+    assert report["score"] == 50 and report["problems_solved"] == 0
+    assert [p["total"] for p in report["problems"]] == [2, 0]
+
+
+def test_no_cases_at_all_scores_zero(monkeypatch):
+    monkeypatch.setattr(execution, "get_backend", EchoBackend)
+    assert asyncio.run(grading.grade({1: []}, {1: execution.Job("pass")}))["score"] == 0
+    assert asyncio.run(grading.grade({}, {}))["score"] == 0
+
+
+def test_grading_a_test_without_problems_is_not_404(client, instructor, student):
+    client.post("/api/v1/code-tests", headers=instructor, json={"title": "Empty", "time_limit": 10, "pass_key": "k", "problems": []})
+    test_id = max(t["id"] for t in client.get("/api/v1/code-tests", headers=instructor).json())
+    response = client.post(f"/api/v1/code-tests/{test_id}/grade", headers=student, json={"solutions": [], "time_taken": "1 mins"})
+    assert response.status_code == 200 and response.json()["score"] == 0
+    assert client.post("/api/v1/code-tests/1000000/grade", headers=student, json={"solutions": [], "time_taken": "1 mins"}).status_code == 404
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+import ingest
+
+
+@pytest.fixture(scope="module")
+def code_test(client, instructor):
+    client.post("/api/v1/code-tests", headers=instructor, json={"title": "Ingest", "time_limit": 10, "pass_key": "k", "problems": [
+        {"title": "p", "description": "d", "difficulty": "easy", "test_cases": "[]"}]})
+    return max(t["id"] for t in client.get("/api/v1/code-tests", headers=instructor).json())
+
+
+def submit(client, headers, test_id, score):
+    return client.post("/api/v1/code-tests/submit", headers=headers, json={"test_id": test_id, "score": score, "problems_solved": 1, "time_taken": "1 mins"})
+
+
+def wait_for_results(client, instructor, test_id, n):
+    for _ in range(100):
+        rows = client.get(f"/api/v1/code-tests/{test_id}/results", headers=instructor).json()
+        if len(rows) >= n: return rows
+        time.sleep(0.02)
+    return rows
+
+
+def test_duplicate_submission_is_refused_and_first_kept(client, instructor, student, code_test):
+    assert submit(client, student, code_test, 40).status_code == 200
+    assert submit(client, student, code_test, 90).status_code == 409  # still queued
+    wait_for_results(client, instructor, code_test, 1)
+    assert submit(client, student, code_test, 90).status_code == 409  # now in the table
+    time.sleep(0.2)
+    assert [r["score"] for r in wait_for_results(client, instructor, code_test, 1)] == [40]
+
+
+def test_submission_to_missing_test_is_404(client, student):
+    assert submit(client, student, 10 ** 6, 1).status_code == 404
+
+
+def test_unstorable_rows_are_dead_lettered(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "RETRY_DELAY", 0)
+    real = ingest._flush_records
+
+    def failing(records):
+        if any(r["test_id"] == -1 for r in records): raise RuntimeError("constraint violated")
+        real(records)
+    monkeypatch.setattr(ingest, "_flush_records", failing)
+    records = [{"test_id": -1, "user_id": 1, "score": 0, "problems_solved": 0, "time_taken": "", "submitted_at": "2026-01-01T00:00:00"}]
+    assert ingest.flush(records, str(tmp_path)) == 1
+    assert "constraint violated" in (tmp_path / ingest.DEAD_LETTER).read_text()
+
+
+def test_journal_rotates_while_never_fully_drained(tmp_path):
+    journal = ingest.Journal(str(tmp_path / "journal-test"), segment_bytes=200)
+    record = {"test_id": 1, "user_id": 1, "score": 0, "problems_solved": 0, "time_taken": "", "submitted_at": "2026-01-01T00:00:00"}
+    for _ in range(50):
+        journal.append(record); journal.append(record)
+        assert not journal.release(journal.written - 1)  # one record always outstanding
+    segments = list(tmp_path.glob("journal-test-*.jsonl"))
+    assert len(segments) <= 2 and sum(p.stat().st_size for p in segments) < 600
+    assert journal.release(journal.written)
+    journal.close(remove=True)
+    assert not list(tmp_path.glob("journal-test-*"))
+
+
+def test_orphaned_segments_are_replayed(tmp_path, monkeypatch):
+    replayed = []
+    monkeypatch.setattr(ingest, "flush", lambda records, directory: replayed.extend(records))
+    journal = ingest.Journal(str(tmp_path / "journal-dead"), segment_bytes=100)
+    for i in range(5):
+        journal.append({"user_id": i}); journal.release(0)
+    journal.close()  # the process died without flushing; its locks are gone
+    assert ingest.replay_orphans(str(tmp_path)) == 5
+    assert sorted(r["user_id"] for r in replayed) == list(range(5)) and not list(tmp_path.glob("journal-*"))
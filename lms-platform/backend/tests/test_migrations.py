@@ -0,0 +1,22 @@
+from sqlalchemy import text
+
+import migrations
+from database import make_engine
+
+
+def test_unique_results_migration_archives_duplicates(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    migrations.upgrade(engine)
+    with engine.begin() as conn:  # back to a schema from before 0003, with repeated submissions
+        conn.execute(text("DROP INDEX uq_test_results_test_id_user_id"))
+        conn.execute(text("DELETE FROM schema_migrations WHERE name = '0003_unique_test_results'"))
+        for score in (40, 90, 70):
+            conn.execute(text("INSERT INTO test_results (test_id, user_id, score) VALUES (1, 2, :s)"), {"s": score})
+        conn.execute(text("INSERT INTO test_results (test_id, user_id, score) VALUES (1, 3, 50)"))
+
+    assert migrations.upgrade(engine) == ["0003_unique_test_results"]
+    with engine.connect() as conn:
+        kept = conn.execute(text("SELECT user_id, score FROM test_results ORDER BY user_id")).all()
+        archived = conn.execute(text("SELECT user_id, score FROM test_results_archive ORDER BY id")).all()
+    assert [tuple(r) for r in kept] == [(2, 40), (3, 50)]  # each student's first submission
+    assert [tuple(r) for r in archived] == [(2, 90), (2, 70)]